@@ -1,14 +1,24 @@
 import streamlit as st
 import requests
+import json
+import os
+import time
+import urllib.error
 
 from modules.pdf_parser import PDFParser
 from modules.chunking import TextChunker
 
 from modules.notes_generator import generate_notes_from_chunks
 from modules.flashcard_generator import generate_flashcards_from_chunks
-from modules.question_generator import generate_questions_from_chunks
+from modules.question_generator import generate_questions_from_chunks, split_questions
 
 from modules.qa_engine import QAEngine
+from modules.job_queue import JobQueue, Tool, content_hash, FAILED
+from modules.dedup import ChunkDeduplicator
+from modules.chunk_store import ChunkStore
+from modules.revisions import RevisionTracker
+from modules.flashcard_store import FlashcardStore
+from modules.ingest_service import IngestClient
 
 
 st.set_page_config(page_title="CramIt 📚", layout="wide")
@@ -16,6 +26,347 @@ st.set_page_config(page_title="CramIt 📚", layout="wide")
 # Backend URL
 BACKEND_URL = "http://localhost:3000"  # Change to 3000
 
+# Shared ingestion service (python -m modules.ingest_service); unset = ingest in-process
+INGEST_SERVICE_URL = os.getenv("INGEST_SERVICE_URL")
+
+# Uploaded PDFs wait here until their ingestion job has read them
+UPLOAD_DIR = "uploads"
+
+# Chunks embedded per indexing job item (one progress step each)
+INDEX_BATCH = 64
+
+# How often a page re-checks a running background job
+POLL_SECONDS = 2
+
+# Saved flashcards shown per page / per review session
+MEMORY_PAGE_SIZE = 20
+REVIEW_BATCH = 5
+
+
+@st.cache_resource
+def get_job_queue():
+    """
+    One job queue per server process, shared by every session.
+    Unfinished jobs from a previous run are resumed on creation.
+    """
+    parser = PDFParser(layout_aware=True)
+    chunker = TextChunker()
+
+    def expand_pdf(payload):
+        data = json.loads(payload)
+        with open(data["path"], "rb") as f:
+            pages, report = parser.parse_with_report(
+                pdf_bytes=f.read(),
+                source_name=data["source"]
+            )
+        return pages, report
+
+    def remove_upload(payload, queue):
+        # the chunks are in the job's outputs now; the PDF is no longer needed
+        path = json.loads(payload)["path"]
+        if os.path.exists(path):
+            os.remove(path)
+
+    def page_key(page):
+        # a revised PDF only re-chunks its new and changed pages
+        return page["metadata"]["page_hash"]
+
+    def restamp_chunks(page, chunks):
+        # same text, but possibly another file name or page number now
+        for chunk in chunks:
+            chunk["metadata"]["source"] = page["metadata"]["source"]
+            chunk["metadata"]["page"] = page["metadata"]["page"]
+        return chunks
+
+    def chunk_page(page):
+        return chunker.chunk_text(
+            page["text"],
+            source=page["metadata"]["source"],
+            page_number=page["metadata"]["page"],
+            page_hash=page["metadata"]["page_hash"]
+        )
+
+    def expand_index(payload):
+        data = json.loads(payload)
+        chunks = data["chunks"]
+        batches = [
+            {"doc_id": data["doc_id"], "chunks": chunks[i:i + INDEX_BATCH]}
+            for i in range(0, len(chunks), INDEX_BATCH)
+        ]
+        return batches, {"chunks": len(chunks)}
+
+    def index_batch(item):
+        return [get_qa_engine().add_chunks(item["chunks"], item["doc_id"])]
+
+    def index_finished(payload, queue):
+        # vectors of unchanged pages were copied from the previous revision;
+        # only now can that revision go
+        release_documents(queue)
+
+    def chunk_key(chunk):
+        # generated output depends only on the chunk text, so unchanged pages
+        # of a revised PDF reuse what was generated for the previous version
+        return content_hash(chunk["text"].encode("utf-8"))
+
+    tools = {
+        "ingest": Tool(
+            "ingest",
+            process=chunk_page,
+            expand=expand_pdf,
+            cache_key=page_key,
+            reuse=restamp_chunks,
+            finish=remove_upload
+        ),
+        "index": Tool("index", process=index_batch, expand=expand_index, finish=index_finished),
+        "notes": Tool(
+            "notes",
+            process=lambda chunk: generate_notes_from_chunks([chunk]),
+            cache_key=chunk_key
+        ),
+        "flashcards": Tool(
+            "flashcards",
+            process=lambda chunk: generate_flashcards_from_chunks([chunk]),
+            cache_key=chunk_key
+        ),
+        "questions": Tool(
+            "questions",
+            process=lambda chunk: generate_questions_from_chunks([chunk]),
+            cache_key=chunk_key
+        ),
+    }
+    return JobQueue(tools)
+
+
+@st.cache_resource
+def get_revision_tracker():
+    return RevisionTracker()
+
+
+def release_documents(queue):
+    """
+    Deletes documents no user's file points to any more (vectors and jobs),
+    and cached outputs of pages no remaining document contains.
+    """
+    release = get_revision_tracker().collect()
+    for doc_hash in release.documents:
+        get_qa_engine().remove_document(doc_hash)
+        queue.forget(doc_hash)
+    queue.prune_pages(release.pages)
+
+
+@st.cache_resource
+def get_ingest_client():
+    return IngestClient(INGEST_SERVICE_URL) if INGEST_SERVICE_URL else None
+
+
+@st.cache_resource
+def get_flashcard_store():
+    return FlashcardStore()
+
+
+@st.cache_resource
+def get_qa_engine():
+    """
+    One QA engine per server process; the Chroma store is shared anyway.
+    """
+    return QAEngine()
+
+
+def ingestion_error(e):
+    """
+    The ingestion service's error message for a rejected request.
+    """
+    try:
+        return json.loads(e.read())["error"]
+    except (OSError, ValueError, KeyError):
+        return e.reason
+
+
+def get_ingest_job(report_errors=True):
+    """
+    The current document's ingestion job, on the ingest service or in-process.
+    None while the ingestion service is unreachable.
+    """
+    if "ingest" not in st.session_state.jobs:
+        return None
+
+    if st.session_state.remote_ingest:
+        try:
+            return get_ingest_client().status(st.session_state.doc_hash)
+        except OSError as e:
+            if report_errors:
+                st.error(f"⚠️ Can't reach the ingestion service right now ({e}). Refresh to try again.")
+            return None
+    return get_job_queue().get(st.session_state.jobs["ingest"])
+
+
+def load_chunks(job):
+    """
+    Stores the finished ingestion job's chunks and their near-duplicate clusters.
+    """
+    if st.session_state.remote_ingest:
+        try:
+            results = get_ingest_client().chunks(job.doc_hash)
+        except OSError as e:
+            st.error(f"⚠️ Couldn't fetch your PDF's chunks from the ingestion service ({e}).")
+            return
+    else:
+        results = get_job_queue().results(job.job_id)
+
+    # Columnar store: one text buffer + typed metadata arrays per session
+    chunks = ChunkStore.from_chunks(results)
+    st.session_state.chunks = chunks
+    st.session_state.dedup = ChunkDeduplicator().cluster(chunks)
+    st.session_state.pdf_uploaded = True
+
+    # A re-published PDF (same user, same file name) only pays for changed
+    # pages: everything unchanged is reused from caches and Chroma
+    tracker = get_revision_tracker()
+    page_diff = tracker.diff(
+        st.session_state.user_token,
+        st.session_state.source_name,
+        chunks.page_hashes()
+    )
+    tracker.record(
+        st.session_state.user_token,
+        st.session_state.source_name,
+        st.session_state.doc_hash,
+        chunks.page_hashes()
+    )
+    st.session_state.revision = page_diff.stats
+
+    # Embed for "Ask Your PDF" in the background right away; the previous
+    # revision is released once this one is indexed. This is the only place
+    # documents are indexed: the ingestion service just parses and chunks
+    queue = get_job_queue()
+    index_job = queue.get(submit_job("index", payload=index_payload()))
+    if index_job.state == "done":
+        release_documents(queue)
+
+
+def unique_chunks():
+    """
+    One chunk per near-duplicate cluster: what the generators actually see.
+    """
+    representatives = st.session_state.dedup.representatives
+    return st.session_state.chunks.take(representatives).to_dicts()
+
+
+def index_payload():
+    """
+    The document's unique chunks, each noting how many near-duplicates it
+    stands in for, scoped to this document in the vector store.
+    """
+    dedup = st.session_state.dedup
+    chunks = unique_chunks()
+    for cluster, chunk in enumerate(chunks):
+        chunk["metadata"]["duplicates"] = len(dedup.members(cluster)) - 1
+    return {"doc_id": st.session_state.doc_hash, "chunks": chunks}
+
+
+def cluster_outputs(job):
+    """
+    A generation job's outputs, one list per near-duplicate cluster
+    (item i of the job is cluster i: see unique_chunks).
+    """
+    return get_job_queue().item_outputs(job.job_id)
+
+
+def cluster_pages(cluster):
+    """
+    Where a cluster's output applies: the pages of all of its member chunks.
+    """
+    chunks = st.session_state.chunks
+    pages = sorted({
+        chunks[i]["metadata"]["page"]
+        for i in st.session_state.dedup.members(cluster)
+    } - {None})
+
+    if not pages:
+        return "this PDF"
+    if len(pages) == 1:
+        return f"page {pages[0]}"
+    shown = ", ".join(str(page) for page in pages[:5])
+    more = f" (+{len(pages) - 5} more)" if len(pages) > 5 else ""
+    return f"pages {shown}{more}"
+
+
+def show_dedup_savings():
+    stats = st.session_state.dedup.stats
+    if stats["llm_calls_saved"]:
+        st.caption(
+            f"♻️ Skipped {stats['llm_calls_saved']} near-duplicate chunks "
+            f"({stats['clusters']} unique of {stats['chunks']}) — "
+            f"that's {stats['llm_calls_saved']} fewer LLM calls."
+        )
+
+
+def save_upload(pdf_bytes):
+    """
+    Writes the PDF where the ingestion job can read it; the job's payload
+    only carries this path.
+    """
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+    path = os.path.join(UPLOAD_DIR, f"{st.session_state.doc_hash}.pdf")
+
+    existing = get_job_queue().find(st.session_state.doc_hash, "ingest")
+    if existing is None or existing.state == FAILED:
+        with open(path, "wb") as f:
+            f.write(pdf_bytes)
+    return path
+
+
+def submit_job(tool, payload=None):
+    """
+    Submits a job for the current document and remembers its id in the session.
+    """
+    job_id = get_job_queue().submit(
+        tool,
+        doc_hash=st.session_state.doc_hash,
+        payload=payload,
+        user=st.session_state.user_token
+    )
+    st.session_state.jobs[tool] = job_id
+    return job_id
+
+
+def show_job(tool, label):
+    """
+    Renders progress for the session's job of this tool.
+    Returns (job, partial results) or (None, []) if nothing was submitted.
+    """
+    job_id = st.session_state.jobs.get(tool)
+    if job_id is None:
+        return None, []
+
+    queue = get_job_queue()
+    job = queue.get(job_id)
+    if job is None:
+        return None, []
+
+    show_progress(job, label)
+    return job, queue.results(job_id)
+
+
+def show_progress(job, label):
+    if job is None:
+        return
+
+    if job.state == FAILED:
+        st.error(f"❌ {label} failed: {job.error} — submit again to resume.")
+    elif not job.finished:
+        st.progress(job.progress, text=f"{label}: {job.done}/{job.total or '?'}")
+
+
+def poll_while_running(job):
+    """
+    Re-runs the page after a short pause so partial results keep streaming in.
+    Navigating away just stops polling; the job keeps running.
+    """
+    if job is not None and not job.finished:
+        time.sleep(POLL_SECONDS)
+        st.rerun()
+
 def login_user(email, password):
     try:
         response = requests.post(
@@ -135,17 +486,33 @@ else:
 
     # YOUR EXISTING SESSION STATE CODE
     if "chunks" not in st.session_state:
-        st.session_state.chunks = []
+        st.session_state.chunks = ChunkStore()
     if "notes" not in st.session_state:
         st.session_state.notes = []
     if "flashcards" not in st.session_state:
         st.session_state.flashcards = []
     if "questions" not in st.session_state:
         st.session_state.questions = []
-    if "saved_flashcards" not in st.session_state:
-        st.session_state.saved_flashcards = []
+    if "memory_page" not in st.session_state:
+        st.session_state.memory_page = 0
     if "pdf_uploaded" not in st.session_state:
         st.session_state.pdf_uploaded = False
+    if "doc_hash" not in st.session_state:
+        st.session_state.doc_hash = None
+    if "jobs" not in st.session_state:
+        st.session_state.jobs = {}
+    if "dedup" not in st.session_state:
+        st.session_state.dedup = None
+    if "revision" not in st.session_state:
+        st.session_state.revision = None
+    if "remote_ingest" not in st.session_state:
+        st.session_state.remote_ingest = False
+
+    # Pick up chunks once the background ingestion job has finished
+    if "ingest" in st.session_state.jobs and not st.session_state.pdf_uploaded:
+        ingest_job = get_ingest_job(report_errors=False)
+        if ingest_job is not None and ingest_job.state == "done":
+            load_chunks(ingest_job)
 
     # Add logout button to sidebar
     st.sidebar.title("👋 Welcome!")
@@ -153,7 +520,7 @@ else:
         st.session_state.authenticated = False
         st.session_state.user_token = None
         # Clear all session data on logout
-        for key in ['chunks', 'notes', 'flashcards', 'questions', 'saved_flashcards', 'pdf_uploaded']:
+        for key in ['chunks', 'notes', 'flashcards', 'questions', 'memory_page', 'pdf_uploaded', 'doc_hash', 'jobs', 'dedup', 'source_name', 'revision', 'prewarmed_doc', 'remote_ingest']:
             if key in st.session_state:
                 del st.session_state[key]
         st.rerun()
@@ -190,34 +557,66 @@ else:
         # 🧠 Submit button
         if uploaded_file is not None:
             if st.button("Let's Cram 🧃"):
-                # Store file
-                st.session_state["uploaded_file"] = uploaded_file
-
-        # Initialize parser & chunker once
-        if "pdf_parser" not in st.session_state:
-            st.session_state.pdf_parser = PDFParser()
-
-        if "text_chunker" not in st.session_state:
-            st.session_state.text_chunker = TextChunker()
-
-        with st.spinner("Reading and chunking your chaotic masterpiece..."):
-            # Read PDF bytes
-            pdf_bytes = uploaded_file.read()
-
-            # Parse PDF → pages
-            pages = st.session_state.pdf_parser.parse(
-                pdf_bytes=pdf_bytes,
-                source_name=uploaded_file.name
-            )
-
-            # Chunk pages
-            chunks = st.session_state.text_chunker.chunk(pages)
-
-        # Store results
-        st.session_state.chunks = chunks
-        st.session_state.pdf_uploaded = True
-
-        st.success("✅ PDF uploaded and processed! Now go hit Notes, Flashcards, or Questions.")
+                pdf_bytes = uploaded_file.getvalue()
+
+                # A new document resets everything generated for the old one
+                st.session_state.doc_hash = content_hash(pdf_bytes)
+                st.session_state.source_name = uploaded_file.name
+                st.session_state.jobs = {}
+                st.session_state.chunks = ChunkStore()
+                st.session_state.notes = []
+                st.session_state.flashcards = []
+                st.session_state.questions = []
+                st.session_state.pdf_uploaded = False
+                st.session_state.remote_ingest = False
+
+                client = get_ingest_client()
+                submit_locally = client is None
+                if client is not None:
+                    # Shared service: a PDF someone already uploaded is ready at once
+                    try:
+                        job = client.submit(pdf_bytes, uploaded_file.name, user=st.session_state.user_token)
+                        st.session_state.jobs["ingest"] = job.job_id
+                        st.session_state.remote_ingest = True
+                    except urllib.error.HTTPError as e:
+                        # the service read the PDF and refused it (too large, not a PDF)
+                        st.error(f"❌ Upload rejected: {ingestion_error(e)}")
+                    except OSError as e:
+                        st.warning(f"⚠️ Ingestion service unavailable ({e}) — processing your PDF here instead.")
+                        submit_locally = True
+
+                if submit_locally:
+                    submit_job("ingest", payload={
+                        "source": uploaded_file.name,
+                        "path": save_upload(pdf_bytes)
+                    })
+
+        # Parse + chunk runs in the background; this only polls it
+        ingest_job = get_ingest_job()
+        show_progress(ingest_job, "Reading and chunking your chaotic masterpiece")
+
+        if ingest_job is not None and ingest_job.state == "done" and not st.session_state.pdf_uploaded:
+            load_chunks(ingest_job)
+
+        if ingest_job is not None and st.session_state.pdf_uploaded:
+            st.success("✅ PDF uploaded and processed! Now go hit Notes, Flashcards, or Questions.")
+
+            revision = st.session_state.revision
+            if revision and revision["is_revision"]:
+                st.caption(
+                    f"🔁 New version of a known PDF: {revision['added']} new/changed pages, "
+                    f"{revision['removed']} removed, {revision['unchanged']} reused as-is."
+                )
+
+            # Boilerplate (running headers, page numbers, footers) stripped at parse time
+            if ingest_job.meta.get("tokens_saved"):
+                st.caption(
+                    f"✂️ Stripped {ingest_job.meta['lines_removed']} header/footer lines — "
+                    f"{ingest_job.meta['tokens_saved']} fewer tokens "
+                    f"({ingest_job.meta['reduction']:.0%} of the document)."
+                )
+
+        poll_while_running(ingest_job)
 
     # -------------------- NOTES --------------------
     elif page == "📚 Notes":
@@ -226,16 +625,28 @@ else:
             st.warning("🗂️ Please upload a PDF first from the Home page.")
         else:
             if st.button("🧠 Generate Notes"):
-                with st.spinner("Generating notes..."):
-                    notes = generate_notes_from_chunks(st.session_state.chunks)
-                st.session_state.notes = notes
-                st.success("✅ Notes generated!")
+                submit_job("notes", payload=unique_chunks())
+
+            notes_job, _ = show_job("notes", "Generating notes")
+            show_dedup_savings()
+            if notes_job is not None:
+                # one note per cluster, shared by every near-duplicate chunk in it
+                st.session_state.notes = [
+                    (cluster, notes)
+                    for cluster, notes in enumerate(cluster_outputs(notes_job))
+                    if notes
+                ]
+                if notes_job.state == "done":
+                    st.success("✅ Notes generated!")
 
             if st.session_state.notes:
                 st.subheader("📚 AI-Generated Study Notes")
-                for i, note in enumerate(st.session_state.notes[:5]):
-                    with st.expander(f"🧠 Notes for Chunk {i+1}"):
-                        st.markdown(note)
+                for cluster, notes in st.session_state.notes[:5]:
+                    with st.expander(f"🧠 Notes for {cluster_pages(cluster)}"):
+                        for note in notes:
+                            st.markdown(note)
+
+            poll_while_running(notes_job)
 
     # -------------------- FLASHCARDS --------------------
     elif page == "🃏 Flashcards":
@@ -246,10 +657,18 @@ else:
         else:
             # Generate flashcards button
             if st.button("🎴 Generate Flashcards"):
-                with st.spinner("Writing flashcards..."):
-                    flashcards = generate_flashcards_from_chunks(st.session_state.chunks)
-                    st.session_state.flashcards = flashcards
-                st.success("✅ Flashcards ready!")
+                submit_job("flashcards", payload=unique_chunks())
+
+            flashcards_job, _ = show_job("flashcards", "Writing flashcards")
+            show_dedup_savings()
+            if flashcards_job is not None:
+                st.session_state.flashcards = [
+                    dict(card, pages=cluster_pages(cluster))
+                    for cluster, cards in enumerate(cluster_outputs(flashcards_job))
+                    for card in cards or []
+                ]
+                if flashcards_job.state == "done":
+                    st.success("✅ Flashcards ready!")
 
             # Display flashcards
             if st.session_state.flashcards:
@@ -264,6 +683,7 @@ else:
                         <div class="flashcard">
                             <p><strong>Q{i+1}: {question}</strong></p>
                             <p>💡 {answer}</p>
+                            <p><small>📄 {card['pages']}</small></p>
                         </div>
                         """,
                         unsafe_allow_html=True
@@ -271,8 +691,58 @@ else:
 
                 # Save button
                 if st.button("💾 Save to My Memory"):
-                    st.session_state.saved_flashcards.extend(st.session_state.flashcards)
-                    st.success("✅ Flashcards saved to your memory!")
+                    added = get_flashcard_store().add_many(
+                        st.session_state.user_token,
+                        st.session_state.flashcards,
+                        source=st.session_state.get("source_name")
+                    )
+                    skipped = len(st.session_state.flashcards) - added
+                    st.success(f"✅ {added} flashcards saved to your memory!")
+                    if skipped:
+                        st.caption(f"♻️ {skipped} were already saved.")
+
+            poll_while_running(flashcards_job)
+
+        # Saved cards live in the flashcard store, not the session
+        store = get_flashcard_store()
+        user = st.session_state.user_token
+        total = store.count(user)
+
+        if total:
+            st.subheader("🧠 My Memory")
+
+            due_count = store.count_due(user)
+            st.caption(f"{total} saved flashcards, {due_count} due for review.")
+
+            for card in store.due(user, limit=REVIEW_BATCH):
+                with st.expander(f"🔁 {card['question']}"):
+                    st.markdown(f"💡 {card['answer']}")
+                    again, good, easy = st.columns(3)
+                    # SM-2 quality: 1 = forgot, 4 = recalled, 5 = effortless
+                    for column, label, quality in (
+                        (again, "😵 Again", 1),
+                        (good, "🙂 Good", 4),
+                        (easy, "😎 Easy", 5),
+                    ):
+                        if column.button(label, key=f"review_{card['id']}_{quality}"):
+                            store.review(user, card["id"], quality)
+                            st.rerun()
+
+            pages = (total + MEMORY_PAGE_SIZE - 1) // MEMORY_PAGE_SIZE
+            st.session_state.memory_page = min(st.session_state.memory_page, pages - 1)
+
+            with st.expander(f"📚 All saved flashcards (page {st.session_state.memory_page + 1} of {pages})"):
+                offset = st.session_state.memory_page * MEMORY_PAGE_SIZE
+                for i, card in enumerate(store.page(user, offset=offset, limit=MEMORY_PAGE_SIZE)):
+                    st.markdown(f"**Q{offset + i + 1}: {card['question']}**  \n💡 {card['answer']}")
+
+                previous, _, following = st.columns([1, 4, 1])
+                if previous.button("⬅️ Previous", disabled=st.session_state.memory_page == 0):
+                    st.session_state.memory_page -= 1
+                    st.rerun()
+                if following.button("Next ➡️", disabled=st.session_state.memory_page >= pages - 1):
+                    st.session_state.memory_page += 1
+                    st.rerun()
 
     # -------------------- QUESTIONS --------------------
     elif page == "❓ Practice Questions":
@@ -281,51 +751,100 @@ else:
             st.warning("🗂️ Please upload a PDF first from the Home page.")
         else:
             if st.button("🧪 Generate Questions"):
-                with st.spinner("Thinking up some brain-busters..."):
-                    questions = generate_questions_from_chunks(st.session_state.chunks)
+                submit_job("questions", payload=unique_chunks())
+
+            questions_job, questions = show_job("questions", "Thinking up some brain-busters")
+            show_dedup_savings()
+            if questions_job is not None:
                 st.session_state.questions = questions
-                st.success("✅ Questions generated!")
+                if questions_job.state == "done":
+                    st.success("✅ Questions generated!")
+
+                    # Students ask exactly these in "Ask Your PDF": answer them in
+                    # the background (once the PDF is indexed) so they come back instantly
+                    if st.session_state.get("prewarmed_doc") != st.session_state.doc_hash:
+                        index_job = get_job_queue().find(st.session_state.doc_hash, "index")
+                        if index_job is not None and index_job.state == "done":
+                            get_qa_engine().prewarm(
+                                split_questions(questions),
+                                st.session_state.doc_hash,
+                                user=st.session_state.user_token
+                            )
+                            st.session_state.prewarmed_doc = st.session_state.doc_hash
+                        else:
+                            poll_while_running(index_job)
 
             if st.session_state.questions:
                 st.subheader("🧠 Practice Questions")
                 for i, q in enumerate(st.session_state.questions):
                     st.markdown(f"**Q{i+1}:** {q}")
 
+            poll_while_running(questions_job)
+
     # -------------------- ASK YOUR PDF --------------------
     elif page == "💬 Ask Your PDF":
         st.title("💬 Ask Your PDF")
 
-    if not st.session_state.pdf_uploaded:
-        st.warning("🗂️ Please upload a PDF first from the Home page.")
-    else:
-        # Initialize QAEngine once
-        if "qa_engine" not in st.session_state:
-            st.session_state.qa_engine = QAEngine()
-
-        user_question = st.text_input("Ask something from your PDF:")
-
-        if user_question:
-            with st.spinner("Thinking real hard..."):
-                result = st.session_state.qa_engine.ask(user_question)
-
-            # Answer
-            st.markdown(f"### 📌 Answer")
-            st.write(result.get("answer", "No answer generated."))
-
-            # RAG Confidence (🔥 WOW factor)
-            rag_conf = result.get("rag_confidence", 0.0)
-            status = result.get("status", "unknown")
-
-            if status == "pass":
-                st.success(f"🧠 RAG Confidence: **{rag_conf}** — Well grounded")
-            elif status == "weak":
-                st.warning(f"⚠️ RAG Confidence: **{rag_conf}** — Partial grounding")
-            else:
-                st.error("❌ Answer not grounded in document")
-
-            # Sources
-            sources = result.get("sources", [])
-            if sources:
-                with st.expander("📚 View Source Evidence"):
-                    for i, src in enumerate(sources, 1):
-                        st.markdown(f"**Source {i}:** {src}")
+        if not st.session_state.pdf_uploaded:
+            st.warning("🗂️ Please upload a PDF first from the Home page.")
+        else:
+            # Embedding runs as a background job (submitted when the PDF was loaded)
+            if "index" not in st.session_state.jobs:
+                submit_job("index", payload=index_payload())
+
+            index_job, index_stats = show_job("index", "Indexing your PDF for questions")
+
+            if index_job is not None and index_job.state == "done":
+                # near-duplicates never reach the index job; it only skips
+                # chunks whose vectors were already in the store
+                near_duplicates = st.session_state.dedup.stats["embeddings_saved"]
+                reused = sum(stats["embeddings_saved"] for stats in index_stats)
+                if near_duplicates + reused:
+                    st.caption(
+                        f"♻️ Embedded {near_duplicates + reused} fewer chunks: "
+                        f"{near_duplicates} near-duplicates, {reused} already indexed."
+                    )
+
+                user_question = st.text_input("Ask something from your PDF:")
+
+                if user_question:
+                    with st.spinner("Thinking real hard..."):
+                        result = get_qa_engine().ask(
+                            user_question,
+                            st.session_state.doc_hash,
+                            user=st.session_state.user_token
+                        )
+
+                    # Answer
+                    st.markdown(f"### 📌 Answer")
+                    if result.get("cached"):
+                        st.caption("⚡ Answered instantly from the answer cache.")
+                    st.write(result.get("answer", "No answer generated."))
+
+                    # RAG Confidence (🔥 WOW factor)
+                    rag_conf = result.get("rag_confidence", 0.0)
+                    status = result.get("status", "unknown")
+
+                    if status == "pass":
+                        st.success(f"🧠 RAG Confidence: **{rag_conf}** — Well grounded")
+                    elif status == "weak":
+                        st.warning(f"⚠️ RAG Confidence: **{rag_conf}** — Partial grounding")
+                    else:
+                        st.error("❌ Answer not grounded in document")
+
+                    # Pre-generation gate: weak retrieval never reaches the LLM
+                    if result.get("gated"):
+                        gate_metrics = get_qa_engine().gate_metrics()
+                        st.caption(
+                            f"🚦 Skipped the LLM: {result['diagnostics'].get('reason', 'weak evidence')}. "
+                            f"(Gate fired on {gate_metrics['gated']} of {gate_metrics['checked']} questions.)"
+                        )
+
+                    # Sources
+                    sources = result.get("sources", [])
+                    if sources:
+                        with st.expander("📚 View Source Evidence"):
+                            for i, src in enumerate(sources, 1):
+                                st.markdown(f"**Source {i}:** {src}")
+
+            poll_while_running(index_job)
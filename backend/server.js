@@ -10,6 +10,7 @@ require("dotenv").config();
 
 const app = express();
 const PORT = process.env.PORT || 5000;
+const INGEST_SERVICE_URL = process.env.INGEST_SERVICE_URL || "http://127.0.0.1:8000";
 
 /* ====================== SECURITY MIDDLEWARE ====================== */
 
@@ -167,25 +168,82 @@ app.post("/api/auth/login", authLimiter, async (req, res) => {
   }
 });
 
-// Upload (future use)
+// Only what a client needs from an ingestion job: the job is shared by
+// everyone who uploaded the same PDF, so nothing about who uploaded it first
+function publicJob(job) {
+  return {
+    documentId: job.document_id,
+    state: job.state,
+    progress: job.progress,
+    done: job.done,
+    total: job.total,
+    error: job.error,
+    pages: job.meta?.pages,
+    duplicate: job.duplicate
+  };
+}
+
+// Upload: hand the PDF to the Python ingestion service (modules/ingest_service.py)
 app.post(
   "/api/upload",
   authenticate,
   uploadLimiter,
   upload.single("pdf"),
-  (req, res) => {
+  async (req, res) => {
     if (!req.file) {
       return res.status(400).json({ error: "No PDF uploaded" });
     }
 
-    res.json({
-      message: "PDF accepted",
-      name: req.file.originalname,
-      size: req.file.size
+    const params = new URLSearchParams({
+      source: req.file.originalname,
+      user: req.user.email
     });
+
+    try {
+      const response = await fetch(`${INGEST_SERVICE_URL}/documents?${params}`, {
+        method: "POST",
+        headers: { "Content-Type": "application/pdf" },
+        body: req.file.buffer
+      });
+      const job = await response.json();
+
+      if (!response.ok) {
+        return res.status(response.status).json({ error: job.error || "Ingestion failed" });
+      }
+
+      res.status(202).json({
+        message: "PDF accepted",
+        name: req.file.originalname,
+        size: req.file.size,
+        documentId: job.document_id,
+        job: publicJob(job)
+      });
+
+    } catch {
+      res.status(502).json({ error: "Ingestion service unavailable" });
+    }
   }
 );
 
+// Ingestion status of an uploaded document
+app.get("/api/documents/:id", authenticate, async (req, res) => {
+  if (!/^[a-f0-9]{64}$/.test(req.params.id)) {
+    return res.status(400).json({ error: "Invalid document id" });
+  }
+
+  try {
+    const response = await fetch(`${INGEST_SERVICE_URL}/documents/${req.params.id}`);
+    const job = await response.json();
+
+    if (!response.ok) {
+      return res.status(response.status).json({ error: job.error || "Unknown document" });
+    }
+    res.json(publicJob(job));
+  } catch {
+    res.status(502).json({ error: "Ingestion service unavailable" });
+  }
+});
+
 /* ====================== GLOBAL ERROR HANDLER ====================== */
 
 app.use((err, _, res, __) => {
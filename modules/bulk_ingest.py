@@ -0,0 +1,279 @@
+# modules/bulk_ingest.py
+"""
+Bulk ingestion of a directory of PDFs into the CramIt vector store.
+
+    python -m modules.bulk_ingest path/to/course_library --workers 8
+
+Parsing and chunking run in a pool of worker processes; embedding runs in
+the main process through the shared rate limiter. Every finished file is
+appended to a manifest, so an interrupted run resumes where it stopped and
+files whose content hash was already ingested for the same user are skipped.
+"""
+
+from typing import Dict, Iterator, List, Optional, Tuple
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+
+from modules.chunk_store import ChunkStore
+
+
+MANIFEST_NAME = ".cramit_manifest.jsonl"
+
+# per-process parser/chunker, built once by the pool initializer
+_worker = {}
+
+
+def _init_worker(layout_aware: bool) -> None:
+    from modules.pdf_parser import PDFParser
+    from modules.chunking import TextChunker
+
+    _worker["parser"] = PDFParser(layout_aware=layout_aware)
+    _worker["chunker"] = TextChunker()
+
+
+def _parse_and_chunk(path: str) -> Tuple[str, ChunkStore, Dict]:
+    """
+    Runs in a worker process: PDF bytes -> pages -> compact chunk store.
+    """
+    with open(path, "rb") as f:
+        pdf_bytes = f.read()
+
+    pages, report = _worker["parser"].parse_with_report(
+        pdf_bytes=pdf_bytes,
+        source_name=os.path.basename(path)
+    )
+    return path, _worker["chunker"].chunk_pages(pages), report
+
+
+def file_hash(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def find_pdfs(root: str) -> Iterator[str]:
+    for dirpath, _, filenames in os.walk(root):
+        for name in sorted(filenames):
+            if name.lower().endswith(".pdf"):
+                yield os.path.join(dirpath, name)
+
+
+class Manifest:
+    """
+    Append-only JSONL record of processed files; the last entry per
+    (user, hash) wins, so another user's run still records its lineages.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.entries: Dict[Tuple[str, str], Dict] = {}
+
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn last line from an interrupted run
+                    self.entries[self._key(entry.get("user"), entry["sha256"])] = entry
+
+    @staticmethod
+    def _key(user: Optional[str], sha256: str) -> Tuple[str, str]:
+        return user or "", sha256
+
+    def status(self, sha256: str, user: Optional[str] = None) -> Optional[str]:
+        return self.entries.get(self._key(user, sha256), {}).get("status")
+
+    def record(self, entry: Dict) -> None:
+        self.entries[self._key(entry.get("user"), entry["sha256"])] = entry
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def ingest_directory(
+    root: str,
+    workers: int = os.cpu_count() or 2,
+    manifest_path: Optional[str] = None,
+    embed: bool = True,
+    layout_aware: bool = True,
+    chunks_dir: Optional[str] = None,
+    user: Optional[str] = None
+) -> Dict:
+    """
+    Ingests every PDF under `root` on behalf of `user` (None: the shared
+    library). Returns run totals.
+    """
+    # the library itself may be a read-only share
+    manifest = Manifest(manifest_path or os.path.join(os.getcwd(), MANIFEST_NAME))
+    target_status = "done" if embed else "chunked"
+    # a chunk-only run is satisfied by files that were fully ingested, too
+    finished = {"done", target_status}
+
+    qa_engine = tracker = None
+    if embed:
+        from modules.qa_engine import QAEngine
+        from modules.revisions import RevisionTracker
+
+        qa_engine = QAEngine()
+        tracker = RevisionTracker()
+
+    if chunks_dir:
+        os.makedirs(chunks_dir, exist_ok=True)
+
+    # hash up front so already-ingested files never reach a worker
+    pending: List[Tuple[str, str]] = []
+    seen = set()
+    skipped = 0
+    for path in find_pdfs(root):
+        sha256 = file_hash(path)
+        if sha256 in seen or manifest.status(sha256, user) in finished:
+            skipped += 1
+            continue
+        seen.add(sha256)
+        pending.append((path, sha256))
+
+    totals = {"files": 0, "failed": 0, "skipped": skipped, "pages": 0, "chunks": 0}
+    print(f"{len(pending)} PDFs to ingest, {skipped} already done or duplicate.")
+    if not pending:
+        return totals
+
+    hashes = dict(pending)
+    start = time.monotonic()
+
+    # parsing outpaces rate-limited embedding: bound the finished ChunkStores
+    # waiting in this process instead of submitting the whole library at once
+    max_in_flight = 2 * workers
+    queued = iter(pending)
+
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        initializer=_init_worker,
+        initargs=(layout_aware,)
+    ) as pool:
+        in_flight = {}
+
+        def fill() -> None:
+            while len(in_flight) < max_in_flight:
+                path = next(queued, (None, None))[0]
+                if path is None:
+                    return
+                try:
+                    future = pool.submit(_parse_and_chunk, path)
+                except BrokenProcessPool as e:
+                    # recorded as failed like the files that were in flight
+                    future = Future()
+                    future.set_exception(e)
+                in_flight[future] = path
+
+        fill()
+        while in_flight:
+            finished_now, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+
+            for future in finished_now:
+                path = in_flight.pop(future)
+                file_start = time.monotonic()
+                try:
+                    _, chunks, report = future.result()
+                    sha256 = hashes[path]
+                    # physics/week1.pdf and chemistry/week1.pdf are different files
+                    source = os.path.relpath(path, root)
+                    entry = {
+                        "path": path,
+                        "sha256": sha256,
+                        "user": user,
+                        "pages": report["pages"],
+                        "chunks": len(chunks),
+                        "tokens_saved": report["tokens_saved"],
+                    }
+
+                    if chunks_dir:
+                        chunks.save(os.path.join(chunks_dir, f"{sha256}.chunks"))
+
+                    if embed:
+                        entry["index"] = qa_engine.add_chunks(chunks, sha256)
+                        # the previous revision goes only after this one reused its vectors
+                        tracker.record(user, source, sha256, chunks.page_hashes())
+                        for doc_hash in tracker.collect().documents:
+                            qa_engine.remove_document(doc_hash)
+
+                    entry["status"] = target_status
+                    totals["files"] += 1
+                    totals["pages"] += report["pages"]
+                    totals["chunks"] += len(chunks)
+
+                except Exception as e:
+                    entry = {
+                        "path": path,
+                        "sha256": hashes[path],
+                        "user": user,
+                        "status": "failed",
+                        "error": str(e),
+                    }
+                    totals["failed"] += 1
+
+                entry["seconds"] = round(time.monotonic() - file_start, 2)
+                manifest.record(entry)
+
+                elapsed = max(time.monotonic() - start, 1e-9)
+                done = totals["files"] + totals["failed"]
+                print(
+                    f"[{done}/{len(pending)}] {entry['status']:<7} "
+                    f"{os.path.basename(entry['path'])}  "
+                    f"({done / elapsed:.2f} files/s, {totals['pages'] / elapsed:.1f} pages/s, "
+                    f"{totals['chunks'] / elapsed:.1f} chunks/s)",
+                    flush=True
+                )
+
+            fill()
+
+    totals["seconds"] = round(time.monotonic() - start, 2)
+    return totals
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description="Bulk-ingest a directory of PDFs into CramIt."
+    )
+    parser.add_argument("directory", help="folder searched recursively for PDFs")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2,
+                        help="parse/chunk worker processes")
+    parser.add_argument("--manifest", default=None,
+                        help=f"progress manifest (default: ./{MANIFEST_NAME})")
+    parser.add_argument("--no-embed", action="store_true",
+                        help="only parse and chunk; skip the vector store")
+    parser.add_argument("--plain-text", action="store_true",
+                        help="disable header/footer stripping")
+    parser.add_argument("--chunks-dir", default=None,
+                        help="also save each document's ChunkStore here")
+    parser.add_argument("--user", default=None,
+                        help="owner of the ingested files (default: shared library)")
+    args = parser.parse_args(argv)
+
+    totals = ingest_directory(
+        args.directory,
+        workers=args.workers,
+        manifest_path=args.manifest,
+        embed=not args.no_embed,
+        layout_aware=not args.plain_text,
+        chunks_dir=args.chunks_dir,
+        user=args.user
+    )
+    print(f"Finished: {totals}")
+    return 1 if totals["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,280 @@
+# modules/chunk_store.py
+
+from typing import Dict, Iterable, Iterator, List, Optional, Set
+from collections.abc import Mapping
+from array import array
+import json
+import sys
+
+
+_MAGIC = b"CRAMCHK2"
+
+# column name -> array typecode
+_COLUMNS = {
+    "chunk_ids": "i",
+    "pages": "i",         # -1 means "no page"
+    "token_counts": "i",
+    "forced": "b",
+    "source_ids": "i",
+    "page_hash_ids": "i",  # -1 means "no page hash"
+}
+
+
+class ChunkView(Mapping):
+    """
+    Read-only, dict-like view of one chunk inside a ChunkStore.
+    Behaves like the dicts TextChunker returns:
+    {"chunk_id", "text", "metadata": {...}}
+    """
+
+    __slots__ = ("_store", "_index")
+
+    _KEYS = ("chunk_id", "text", "metadata")
+
+    def __init__(self, store: "ChunkStore", index: int):
+        self._store = store
+        self._index = index
+
+    def __getitem__(self, key: str):
+        if key == "text":
+            return self._store._text(self._index)
+        if key == "chunk_id":
+            return self._store._cols["chunk_ids"][self._index]
+        if key == "metadata":
+            return self._store._metadata(self._index)
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._KEYS)
+
+    def __len__(self) -> int:
+        return len(self._KEYS)
+
+    def to_dict(self) -> Dict:
+        return {key: self[key] for key in self._KEYS}
+
+    def __repr__(self) -> str:
+        return repr(self.to_dict())
+
+
+class ChunkStore:
+    """
+    Compact columnar container for chunks.
+
+    - all text lives in one shared UTF-8 buffer addressed by offsets
+    - metadata lives in typed arrays, sources are interned
+    - slicing returns a view over the same buffers (no copies)
+    - save/load write the raw buffers straight to disk
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+        self._offsets = array("q", [0])
+        self._cols = {name: array(code) for name, code in _COLUMNS.items()}
+        self._sources: List[str] = []
+        self._source_index: Dict[str, int] = {}
+        self._page_hashes: List[str] = []
+        self._page_hash_index: Dict[str, int] = {}
+        self._start = 0
+        self._stop = 0
+        self._is_slice = False
+
+    # ---------- building ----------
+
+    @classmethod
+    def from_chunks(cls, chunks: Iterable[Mapping]) -> "ChunkStore":
+        """
+        Packs chunk dicts (as produced by TextChunker) into a store.
+        """
+        store = cls()
+        for chunk in chunks:
+            metadata = chunk["metadata"]
+            store.append(
+                chunk_id=chunk["chunk_id"],
+                text=chunk["text"],
+                source=metadata.get("source"),
+                page=metadata.get("page"),
+                token_count=metadata.get("token_count", 0),
+                forced=metadata.get("forced_split", False),
+                page_hash=metadata.get("page_hash")
+            )
+        return store
+
+    def append(
+        self,
+        chunk_id: int,
+        text: str,
+        source: Optional[str],
+        page: Optional[int],
+        token_count: int,
+        forced: bool = False,
+        page_hash: Optional[str] = None
+    ) -> None:
+        if self._is_view():
+            raise TypeError("Cannot append to a sliced ChunkStore view")
+
+        source = source or ""
+        if source not in self._source_index:
+            self._source_index[source] = len(self._sources)
+            self._sources.append(source)
+
+        if page_hash is not None and page_hash not in self._page_hash_index:
+            self._page_hash_index[page_hash] = len(self._page_hashes)
+            self._page_hashes.append(page_hash)
+
+        self._buffer += text.encode("utf-8")
+        self._offsets.append(len(self._buffer))
+
+        self._cols["chunk_ids"].append(chunk_id)
+        self._cols["pages"].append(-1 if page is None else page)
+        self._cols["token_counts"].append(token_count)
+        self._cols["forced"].append(1 if forced else 0)
+        self._cols["source_ids"].append(self._source_index[source])
+        self._cols["page_hash_ids"].append(
+            -1 if page_hash is None else self._page_hash_index[page_hash]
+        )
+        self._stop += 1
+
+    def take(self, indices: Iterable[int]) -> "ChunkStore":
+        """
+        Compact copy holding only the given chunks (e.g. dedup representatives).
+        """
+        store = ChunkStore()
+        for i in indices:
+            view = self[i]
+            metadata = view["metadata"]
+            store.append(
+                chunk_id=view["chunk_id"],
+                text=view["text"],
+                source=metadata["source"],
+                page=metadata["page"],
+                token_count=metadata["token_count"],
+                forced=metadata["forced_split"],
+                page_hash=metadata["page_hash"]
+            )
+        return store
+
+    # ---------- access ----------
+
+    def _is_view(self) -> bool:
+        return self._is_slice
+
+    def _text(self, i: int) -> str:
+        with memoryview(self._buffer) as buf:
+            return str(buf[self._offsets[i]:self._offsets[i + 1]], "utf-8")
+
+    def _metadata(self, i: int) -> Dict:
+        page = self._cols["pages"][i]
+        page_hash_id = self._cols["page_hash_ids"][i]
+        return {
+            "source": self._sources[self._cols["source_ids"][i]],
+            "page": None if page < 0 else page,
+            "token_count": self._cols["token_counts"][i],
+            "forced_split": bool(self._cols["forced"][i]),
+            "page_hash": None if page_hash_id < 0 else self._page_hashes[page_hash_id]
+        }
+
+    def __len__(self) -> int:
+        return self._stop - self._start
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            start, stop, step = key.indices(len(self))
+            if step != 1:
+                return [self[i] for i in range(start, stop, step)]
+
+            view = ChunkStore.__new__(ChunkStore)
+            view.__dict__.update(self.__dict__)
+            view._start = self._start + start
+            view._stop = self._start + max(start, stop)
+            view._is_slice = True
+            return view
+
+        if key < 0:
+            key += len(self)
+        if not 0 <= key < len(self):
+            raise IndexError("chunk index out of range")
+        return ChunkView(self, self._start + key)
+
+    def __iter__(self) -> Iterator[ChunkView]:
+        for i in range(self._start, self._stop):
+            yield ChunkView(self, i)
+
+    def page_hashes(self) -> Set[str]:
+        """
+        Distinct page hashes of the chunks in this store (or view).
+        """
+        ids = self._cols["page_hash_ids"][self._start:self._stop]
+        return {self._page_hashes[i] for i in set(ids) if i >= 0}
+
+    def to_dicts(self) -> List[Dict]:
+        return [view.to_dict() for view in self]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Approximate payload size of the underlying buffers.
+        """
+        return (
+            len(self._buffer)
+            + self._offsets.itemsize * len(self._offsets)
+            + sum(col.itemsize * len(col) for col in self._cols.values())
+        )
+
+    # ---------- persistence ----------
+
+    def save(self, path: str) -> None:
+        """
+        Writes the store (or view) as a header plus raw column buffers.
+        """
+        store = self if not self._is_view() else self.take(range(len(self)))
+
+        header = json.dumps({
+            "count": len(store),
+            "byteorder": sys.byteorder,
+            "buffer_size": len(store._buffer),
+            "sources": store._sources,
+            "page_hashes": store._page_hashes
+        }).encode("utf-8")
+
+        with open(path, "wb") as f:
+            f.write(_MAGIC)
+            f.write(len(header).to_bytes(8, "little"))
+            f.write(header)
+            store._offsets.tofile(f)
+            for name in _COLUMNS:
+                store._cols[name].tofile(f)
+            f.write(store._buffer)
+
+    @classmethod
+    def load(cls, path: str) -> "ChunkStore":
+        store = cls()
+
+        with open(path, "rb") as f:
+            if f.read(len(_MAGIC)) != _MAGIC:
+                raise ValueError(f"Not a chunk store file: {path}")
+
+            header_size = int.from_bytes(f.read(8), "little")
+            header = json.loads(f.read(header_size))
+            count = header["count"]
+
+            store._offsets = array("q")
+            store._offsets.fromfile(f, count + 1)
+            for name, code in _COLUMNS.items():
+                col = array(code)
+                col.fromfile(f, count)
+                store._cols[name] = col
+
+            store._buffer = bytearray(f.read(header["buffer_size"]))
+
+        if header["byteorder"] != sys.byteorder:
+            store._offsets.byteswap()
+            for col in store._cols.values():
+                col.byteswap()
+
+        store._sources = header["sources"]
+        store._source_index = {s: i for i, s in enumerate(store._sources)}
+        store._page_hashes = header["page_hashes"]
+        store._page_hash_index = {h: i for i, h in enumerate(store._page_hashes)}
+        store._stop = count
+        return store
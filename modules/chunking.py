@@ -4,6 +4,8 @@ from typing import List, Dict
 import re
 import tiktoken
 
+from modules.chunk_store import ChunkStore
+
 
 class TextChunker:
     """
@@ -39,7 +41,8 @@ class TextChunker:
         self,
         text: str,
         source: str,
-        page_number: int | None = None
+        page_number: int | None = None,
+        page_hash: str | None = None
     ) -> List[Dict]:
         """
         Produces semantically coherent, overlapping chunks with rich metadata.
@@ -62,7 +65,8 @@ class TextChunker:
                             chunk_id,
                             " ".join(current_chunk),
                             source,
-                            page_number
+                            page_number,
+                            page_hash
                         )
                     )
                     chunk_id += 1
@@ -75,6 +79,7 @@ class TextChunker:
                         sentence,
                         source,
                         page_number,
+                        page_hash,
                         forced=True
                     )
                 )
@@ -88,7 +93,8 @@ class TextChunker:
                         chunk_id,
                         " ".join(current_chunk),
                         source,
-                        page_number
+                        page_number,
+                        page_hash
                     )
                 )
                 chunk_id += 1
@@ -108,12 +114,39 @@ class TextChunker:
                     chunk_id,
                     " ".join(current_chunk),
                     source,
-                    page_number
+                    page_number,
+                    page_hash
                 )
             )
 
         return chunks
 
+    def chunk_pages(self, pages: List[Dict]) -> ChunkStore:
+        """
+        Chunks parsed pages (PDFParser output) straight into a compact ChunkStore.
+        """
+        store = ChunkStore()
+
+        for page in pages:
+            for chunk in self.chunk_text(
+                page["text"],
+                source=page["metadata"]["source"],
+                page_number=page["metadata"]["page"],
+                page_hash=page["metadata"].get("page_hash")
+            ):
+                metadata = chunk["metadata"]
+                store.append(
+                    chunk_id=chunk["chunk_id"],
+                    text=chunk["text"],
+                    source=metadata["source"],
+                    page=metadata["page"],
+                    token_count=metadata["token_count"],
+                    forced=metadata["forced_split"],
+                    page_hash=metadata["page_hash"]
+                )
+
+        return store
+
     # ---------- internals ----------
 
     def _get_overlap(self, sentences: List[str]) -> List[str]:
@@ -138,6 +171,7 @@ class TextChunker:
         text: str,
         source: str,
         page_number: int | None,
+        page_hash: str | None = None,
         forced: bool = False
     ) -> Dict:
         return {
@@ -147,6 +181,7 @@ class TextChunker:
                 "source": source,
                 "page": page_number,
                 "token_count": self._token_len(text),
-                "forced_split": forced
+                "forced_split": forced,
+                "page_hash": page_hash
             }
         }
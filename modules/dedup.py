@@ -0,0 +1,154 @@
+# modules/dedup.py
+
+from typing import Dict, List, Sequence
+from dataclasses import dataclass, field
+import re
+import zlib
+
+import numpy as np
+
+
+# Mersenne prime for the MinHash permutations (a * h fits in uint64)
+_PRIME = (1 << 31) - 1
+
+
+@dataclass
+class DedupResult:
+    """
+    Outcome of near-duplicate clustering.
+
+    - representatives: chunk index that stands in for each cluster
+    - assignment: cluster index for every input chunk
+    """
+    representatives: List[int]
+    assignment: List[int]
+    _members: List[List[int]] = field(init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self._members = [[] for _ in self.representatives]
+        for i, cluster in enumerate(self.assignment):
+            self._members[cluster].append(i)
+
+    def members(self, cluster: int) -> List[int]:
+        """
+        Indices of every chunk in a cluster (the representative first).
+        """
+        return self._members[cluster]
+
+    @property
+    def stats(self) -> Dict:
+        saved = len(self.assignment) - len(self.representatives)
+        return {
+            "chunks": len(self.assignment),
+            "clusters": len(self.representatives),
+            "llm_calls_saved": saved,
+            # chunks not embedded (one embedding request covers many chunks)
+            "embeddings_saved": saved
+        }
+
+
+class ChunkDeduplicator:
+    """
+    MinHash + LSH near-duplicate detection for text chunks.
+    Catches repeated boilerplate (footers, definition boxes, copied paragraphs)
+    in roughly linear time, without comparing every pair of chunks.
+    """
+
+    def __init__(
+        self,
+        num_perm: int = 128,
+        bands: int = 16,
+        shingle_size: int = 3,
+        threshold: float = 0.8,
+        seed: int = 1
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        self.threshold = threshold
+
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, _PRIME, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, _PRIME, size=num_perm, dtype=np.uint64)
+
+    # ---------- helpers ----------
+
+    def _shingles(self, text: str) -> List[str]:
+        words = re.findall(r"\w+", text.lower())
+        if len(words) <= self.shingle_size:
+            return [" ".join(words)] if words else []
+        return [
+            " ".join(words[i:i + self.shingle_size])
+            for i in range(len(words) - self.shingle_size + 1)
+        ]
+
+    def signature(self, text: str) -> np.ndarray | None:
+        """
+        MinHash signature of a chunk, or None for text without words.
+        """
+        shingles = self._shingles(text)
+        if not shingles:
+            return None
+
+        hashes = np.fromiter(
+            (zlib.crc32(s.encode("utf-8")) % _PRIME for s in set(shingles)),
+            dtype=np.uint64
+        )
+        permuted = (np.outer(self._a, hashes) + self._b[:, None]) % _PRIME
+        return permuted.min(axis=1)
+
+    # ---------- main API ----------
+
+    def cluster(self, chunks: Sequence[Dict]) -> DedupResult:
+        """
+        Groups near-identical chunks; the first chunk of each group represents it.
+        """
+        n = len(chunks)
+        parent = list(range(n))
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        def union(i: int, j: int) -> None:
+            ri, rj = find(i), find(j)
+            if ri != rj:
+                # keep the earliest chunk as root so it becomes the representative
+                parent[max(ri, rj)] = min(ri, rj)
+
+        signatures = [self.signature(chunk["text"]) for chunk in chunks]
+
+        buckets: Dict[tuple, int] = {}
+        for i, sig in enumerate(signatures):
+            if sig is None:
+                continue
+
+            for band in range(self.bands):
+                key = (band, sig[band * self.rows:(band + 1) * self.rows].tobytes())
+                head = buckets.setdefault(key, i)
+                if head == i or find(head) == find(i):
+                    continue
+
+                # LSH only proposes candidates; confirm on the full signature
+                similarity = float(np.mean(signatures[head] == sig))
+                if similarity >= self.threshold:
+                    union(head, i)
+
+        representatives: List[int] = []
+        cluster_of_root: Dict[int, int] = {}
+        assignment: List[int] = []
+
+        for i in range(n):
+            root = find(i)
+            if root not in cluster_of_root:
+                cluster_of_root[root] = len(representatives)
+                representatives.append(root)
+            assignment.append(cluster_of_root[root])
+
+        return DedupResult(representatives=representatives, assignment=assignment)
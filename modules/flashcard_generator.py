@@ -2,10 +2,13 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
 import os
 
+from modules.rate_limiter import get_rate_limiter, estimate_tokens
+
 llm = ChatGoogleGenerativeAI(
     model="gemini-1.5-flash",
     temperature=0.3,
-    google_api_key=os.getenv("GEMINI_API_KEY")
+    google_api_key=os.getenv("GEMINI_API_KEY"),
+    max_retries=0,  # the shared rate limiter retries and backs off
 )
 
 FLASHCARD_PROMPT = """
@@ -24,11 +27,16 @@ TEXT:
 prompt = PromptTemplate.from_template(FLASHCARD_PROMPT)
 flashcard_chain = prompt | llm
 
-def generate_flashcards_from_chunks(chunks):
+def generate_flashcards_from_chunks(chunks, user=None):
+    limiter = get_rate_limiter()
     flashcards = []
 
     for chunk in chunks:
-        response = flashcard_chain.invoke({"chunk": chunk})
+        response = limiter.call(
+            lambda: flashcard_chain.invoke({"chunk": chunk}),
+            user=user,
+            tokens=estimate_tokens(FLASHCARD_PROMPT + str(chunk))
+        )
         text = response.content.strip().split("\n")
 
         question, answer = "", ""
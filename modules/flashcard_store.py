@@ -0,0 +1,202 @@
+# modules/flashcard_store.py
+
+from typing import Dict, Iterable, List, Optional
+from contextlib import closing
+import hashlib
+import sqlite3
+import threading
+import time
+
+
+DAY = 24 * 60 * 60
+
+
+def card_hash(question: str, answer: str) -> str:
+    """
+    Content hash of a card, insensitive to case and whitespace.
+    """
+    normalized = "\n".join(" ".join(text.lower().split()) for text in (question, answer))
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+class FlashcardStore:
+    """
+    Persistent per-user flashcard memory (SQLite).
+
+    - content-hash dedup: saving the same card twice is a no-op
+    - a missing user (None) is stored as "", never dropped
+    - (user, due_at) index: "next N cards due" is an index range scan
+    - SM-2 style spaced repetition on review
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS flashcards (
+        id            INTEGER PRIMARY KEY,
+        user          TEXT NOT NULL,
+        content_hash  TEXT NOT NULL,
+        question      TEXT NOT NULL,
+        answer        TEXT NOT NULL,
+        source        TEXT,
+        created_at    REAL NOT NULL,
+        due_at        REAL NOT NULL,
+        interval_days REAL NOT NULL DEFAULT 0,
+        ease          REAL NOT NULL DEFAULT 2.5,
+        reps          INTEGER NOT NULL DEFAULT 0,
+        UNIQUE (user, content_hash)
+    );
+    CREATE INDEX IF NOT EXISTS flashcards_due ON flashcards (user, due_at);
+    CREATE INDEX IF NOT EXISTS flashcards_user ON flashcards (user, id);
+    """
+
+    COLUMNS = "id, question, answer, source, due_at, interval_days, ease, reps"
+
+    def __init__(self, db_path: str = "cramit_flashcards.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        return conn
+
+    def _query(self, sql: str, params: tuple) -> List[Dict]:
+        with self._lock, closing(self._connect()) as conn:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    # ---------- main API ----------
+
+    def add_many(
+        self,
+        user: Optional[str],
+        cards: Iterable[Dict],
+        source: Optional[str] = None,
+        now: Optional[float] = None
+    ) -> int:
+        """
+        Bulk-inserts cards ({"question", "answer"}), skipping ones the user
+        already has. New cards are due immediately. Returns how many were new.
+        """
+        now = time.time() if now is None else now
+        rows = [
+            (
+                user or "",
+                card_hash(card["question"], card["answer"]),
+                card["question"],
+                card["answer"],
+                source,
+                now,
+                now
+            )
+            for card in cards
+        ]
+
+        with self._lock, closing(self._connect()) as conn, conn:
+            before = conn.total_changes
+            conn.executemany(
+                """
+                INSERT INTO flashcards
+                    (user, content_hash, question, answer, source, created_at, due_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT (user, content_hash) DO NOTHING
+                """,
+                rows
+            )
+            return conn.total_changes - before
+
+    def count(self, user: Optional[str]) -> int:
+        return self._query(
+            "SELECT COUNT(*) AS n FROM flashcards WHERE user = ?", (user or "",)
+        )[0]["n"]
+
+    def count_due(self, user: Optional[str], now: Optional[float] = None) -> int:
+        now = time.time() if now is None else now
+        return self._query(
+            "SELECT COUNT(*) AS n FROM flashcards WHERE user = ? AND due_at <= ?",
+            (user or "", now)
+        )[0]["n"]
+
+    def page(self, user: Optional[str], offset: int = 0, limit: int = 20) -> List[Dict]:
+        """
+        Saved cards in insertion order, one page at a time.
+        """
+        return self._query(
+            f"""
+            SELECT {self.COLUMNS} FROM flashcards
+            WHERE user = ?
+            ORDER BY id
+            LIMIT ? OFFSET ?
+            """,
+            (user or "", limit, offset)
+        )
+
+    def due(self, user: Optional[str], limit: int = 10, now: Optional[float] = None) -> List[Dict]:
+        """
+        The next `limit` cards due for review, most overdue first.
+        """
+        now = time.time() if now is None else now
+        return self._query(
+            f"""
+            SELECT {self.COLUMNS} FROM flashcards
+            WHERE user = ? AND due_at <= ?
+            ORDER BY due_at
+            LIMIT ?
+            """,
+            (user or "", now, limit)
+        )
+
+    def review(
+        self,
+        user: Optional[str],
+        card_id: int,
+        quality: int,
+        now: Optional[float] = None
+    ) -> Optional[Dict]:
+        """
+        Records a review (quality 0-5, SM-2) and schedules the next one.
+        """
+        now = time.time() if now is None else now
+        quality = max(0, min(5, quality))
+
+        with self._lock, closing(self._connect()) as conn, conn:
+            row = conn.execute(
+                f"SELECT {self.COLUMNS} FROM flashcards WHERE id = ? AND user = ?",
+                (card_id, user or "")
+            ).fetchone()
+            if row is None:
+                return None
+
+            card = dict(row)
+
+            if quality < 3:
+                # forgotten: start over, see it again soon
+                card["reps"] = 0
+                card["interval_days"] = 0
+                due_at = now + 10 * 60
+            else:
+                card["reps"] += 1
+                if card["reps"] == 1:
+                    card["interval_days"] = 1
+                elif card["reps"] == 2:
+                    card["interval_days"] = 6
+                else:
+                    card["interval_days"] = round(card["interval_days"] * card["ease"], 2)
+                due_at = now + card["interval_days"] * DAY
+
+            card["ease"] = round(max(
+                1.3,
+                card["ease"] + 0.1 - (5 - quality) * (0.08 + (5 - quality) * 0.02)
+            ), 2)
+            card["due_at"] = due_at
+
+            conn.execute(
+                """
+                UPDATE flashcards
+                SET due_at = ?, interval_days = ?, ease = ?, reps = ?
+                WHERE id = ?
+                """,
+                (due_at, card["interval_days"], card["ease"], card["reps"], card_id)
+            )
+            return card
@@ -0,0 +1,389 @@
+# modules/ingest_service.py
+"""
+Standalone HTTP ingestion service: PDF upload -> parse -> chunk.
+
+    python -m modules.ingest_service --port 8000 --workers 4
+
+    POST /documents?source=<file name>&user=<email>   body: the raw PDF
+    GET  /documents/<document_id>                      job status
+    GET  /documents/<document_id>/chunks               chunks, once done
+    GET  /health
+
+The document id is the SHA-256 of the PDF, so the same file uploaded by any
+number of users is parsed once. Uploads are streamed to disk, parsing runs
+in a fixed pool of worker processes driven by a fixed pool of job workers;
+jobs survive a restart (see modules.job_queue).
+
+The service does not embed. Indexing has one owner, the app: it fetches the
+chunks, clusters near-duplicates across the whole document and submits its
+own index job (see load_chunks in app.py), which also releases the previous
+revision of a re-uploaded PDF.
+"""
+
+from typing import BinaryIO, Dict, List, Optional, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import asdict
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, quote, urlsplit
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import tempfile
+import threading
+import urllib.error
+import urllib.request
+
+from modules.bulk_ingest import _init_worker, _parse_and_chunk
+from modules.chunk_store import ChunkStore
+from modules.job_queue import FAILED, Job, JobQueue, Tool
+
+
+MAX_UPLOAD_BYTES = int(os.getenv("INGEST_MAX_UPLOAD_MB", "50")) * 1024 * 1024
+
+# a finished document's chunks, next to its upload (the PDF itself is deleted)
+CHUNKS_FILE = "chunks.bin"
+
+_UNSAFE_NAME = re.compile(r"[^\w.\- ]+")
+
+
+def safe_filename(name: Optional[str]) -> str:
+    name = _UNSAFE_NAME.sub("_", os.path.basename(name or "")).strip(" .")
+    return name or "document.pdf"
+
+
+@lru_cache(maxsize=16)
+def _load_chunks(path: str, mtime: float) -> ChunkStore:
+    # keyed by mtime too: a re-ingested document rewrites the file
+    return ChunkStore.load(path)
+
+
+def job_to_dict(job: Job) -> Dict:
+    data = asdict(job)
+    # the first uploader's email: every later uploader shares this job
+    del data["user"]
+    data["document_id"] = job.doc_hash
+    data["progress"] = round(job.progress, 3)
+    return data
+
+
+class UploadError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class IngestService:
+    """
+    Shared ingestion backend for every CramIt user.
+
+    - content-hash document ids: identical uploads share one job
+    - parse/chunk in worker processes, driven by a fixed thread pool
+    - chunks are kept once, in <upload_dir>/<document id>/chunks.bin, and
+      the PDF is deleted when done
+    - no embedding: the app indexes the chunks it fetches
+    """
+
+    def __init__(
+        self,
+        upload_dir: str = "uploads",
+        db_path: str = "cramit_ingest.db",
+        workers: int = 4,
+        parse_workers: Optional[int] = None,
+        layout_aware: bool = True
+    ):
+        self.upload_dir = upload_dir
+        self._parse_workers = parse_workers or workers
+        self._layout_aware = layout_aware
+        self._parsers_lock = threading.Lock()
+        os.makedirs(upload_dir, exist_ok=True)
+
+        self._parsers = self._new_parsers()
+
+        # created last: resuming jobs needs the parser pool
+        self.queue = JobQueue(
+            {"ingest": Tool(
+                "ingest",
+                # all the work is in expand; the job has no items
+                process=lambda item: [],
+                expand=self._parse,
+                finish=self._remove_pdf
+            )},
+            db_path=db_path,
+            max_workers=workers
+        )
+
+    def _new_parsers(self) -> ProcessPoolExecutor:
+        # spawn, not fork: the pool starts lazily from a threaded process
+        return ProcessPoolExecutor(
+            max_workers=self._parse_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self._layout_aware,)
+        )
+
+    # ---------- main API ----------
+
+    def submit_upload(
+        self,
+        stream: BinaryIO,
+        length: int,
+        source: Optional[str] = None,
+        user: Optional[str] = None
+    ) -> Tuple[Job, bool]:
+        """
+        Streams `length` bytes of PDF to disk and queues its ingestion.
+        Returns (job, duplicate); duplicate uploads reuse the existing job.
+        """
+        if length == 0:
+            raise UploadError(400, "Empty upload")
+        if length > MAX_UPLOAD_BYTES:
+            raise UploadError(413, f"PDF larger than {MAX_UPLOAD_BYTES // (1024 * 1024)} MB")
+
+        digest = hashlib.sha256()
+        tmp = tempfile.NamedTemporaryFile(dir=self.upload_dir, suffix=".part", delete=False)
+        try:
+            with tmp:
+                remaining = length
+                while remaining:
+                    block = stream.read(min(1 << 20, remaining))
+                    if not block:
+                        raise UploadError(400, "Upload ended early")
+                    if remaining == length and not block.startswith(b"%PDF-"):
+                        raise UploadError(415, "Only PDF files allowed")
+                    digest.update(block)
+                    tmp.write(block)
+                    remaining -= len(block)
+
+            doc_hash = digest.hexdigest()
+            existing = self.queue.find(doc_hash, "ingest")
+            if existing is not None and existing.state != FAILED:
+                return existing, True
+
+            doc_dir = os.path.join(self.upload_dir, doc_hash)
+            os.makedirs(doc_dir, exist_ok=True)
+            path = os.path.join(doc_dir, safe_filename(source))
+            os.replace(tmp.name, path)
+        finally:
+            if os.path.exists(tmp.name):
+                os.remove(tmp.name)
+
+        # a concurrent upload of the same file gets the same job back
+        job_id = self.queue.submit(
+            "ingest",
+            doc_hash,
+            payload={"path": path, "source": os.path.basename(path)},
+            user=user
+        )
+        return self.queue.get(job_id), False
+
+    def status(self, doc_id: str) -> Optional[Job]:
+        return self.queue.find(doc_id, "ingest")
+
+    def chunks(self, doc_id: str) -> Optional[List[Dict]]:
+        path = self._chunks_path(doc_id)
+        if not os.path.exists(path):
+            return None
+        return _load_chunks(path, os.path.getmtime(path)).to_dicts()
+
+    def _chunks_path(self, doc_id: str) -> str:
+        return os.path.join(self.upload_dir, doc_id, CHUNKS_FILE)
+
+    def shutdown(self) -> None:
+        self.queue.shutdown(wait=False)
+        with self._parsers_lock:
+            self._parsers.shutdown(wait=False, cancel_futures=True)
+
+    # ---------- job steps ----------
+
+    def _parse(self, payload: bytes) -> Tuple[List, Dict]:
+        data = json.loads(payload)
+        _, chunks, report = self._run_parser(data["path"])
+
+        doc_id = os.path.basename(os.path.dirname(data["path"]))
+        chunks.save(self._chunks_path(doc_id))
+        return [], dict(report, source=data["source"], chunks=len(chunks))
+
+    def _run_parser(self, path: str) -> Tuple[str, ChunkStore, Dict]:
+        """
+        Parses in the worker pool. A dead worker (OOM, a crash inside the
+        PDF library) breaks the whole pool: replace it and retry once, so
+        only a PDF that also kills the fresh pool fails.
+        """
+        with self._parsers_lock:
+            parsers = self._parsers
+        try:
+            return parsers.submit(_parse_and_chunk, path).result()
+        except BrokenProcessPool:
+            with self._parsers_lock:
+                # only the first job to notice replaces the pool
+                if self._parsers is parsers:
+                    parsers.shutdown(wait=False, cancel_futures=True)
+                    self._parsers = self._new_parsers()
+                parsers = self._parsers
+            return parsers.submit(_parse_and_chunk, path).result()
+
+    def _remove_pdf(self, payload: bytes, queue: JobQueue) -> None:
+        # the chunks are in chunks.bin now; the PDF is no longer needed
+        path = json.loads(payload)["path"]
+        if os.path.exists(path):
+            os.remove(path)
+
+
+# ---------- HTTP ----------
+
+class IngestServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, service: IngestService):
+        super().__init__(address, _Handler)
+        self.service = service
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: IngestServer
+
+    def log_message(self, format, *args):
+        if os.getenv("INGEST_ACCESS_LOG"):
+            super().log_message(format, *args)
+
+    def _reply(self, status: int, body: Dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self) -> List[str]:
+        return [part for part in urlsplit(self.path).path.split("/") if part]
+
+    def do_GET(self):
+        parts = self._route()
+        service = self.server.service
+
+        if parts == ["health"]:
+            return self._reply(200, {"status": "ok"})
+
+        if len(parts) in (2, 3) and parts[0] == "documents":
+            job = service.status(parts[1])
+            if job is None:
+                return self._reply(404, {"error": "Unknown document"})
+            if len(parts) == 2:
+                return self._reply(200, job_to_dict(job))
+            if parts[2] == "chunks":
+                if job.state != "done":
+                    return self._reply(409, dict(job_to_dict(job), error="Not ingested yet"))
+                return self._reply(200, {
+                    "document_id": job.doc_hash,
+                    "chunks": service.chunks(job.doc_hash)
+                })
+
+        return self._reply(404, {"error": "Not found"})
+
+    def do_POST(self):
+        if self._route() != ["documents"]:
+            return self._reply(404, {"error": "Not found"})
+
+        length = self.headers.get("Content-Length")
+        if length is None or not length.isdigit():
+            self.close_connection = True
+            return self._reply(411, {"error": "Content-Length required"})
+
+        query = parse_qs(urlsplit(self.path).query)
+        try:
+            job, duplicate = self.server.service.submit_upload(
+                self.rfile,
+                int(length),
+                source=query.get("source", [None])[0],
+                user=query.get("user", [None])[0]
+            )
+        except UploadError as e:
+            # the rest of the body was not read; don't reuse the connection
+            self.close_connection = True
+            return self._reply(e.status, {"error": str(e)})
+
+        return self._reply(202, dict(job_to_dict(job), duplicate=duplicate))
+
+
+class IngestClient:
+    """
+    Minimal client for the service (used by the Streamlit app).
+    """
+
+    def __init__(self, base_url: str, timeout: float = 30):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+
+    def _request(self, method: str, path: str, data: Optional[bytes] = None) -> Dict:
+        request = urllib.request.Request(
+            self.base_url + path,
+            data=data,
+            headers={"Content-Type": "application/pdf"} if data is not None else {},
+            method=method
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            return json.loads(response.read())
+
+    @staticmethod
+    def _job(data: Dict) -> Job:
+        fields = [name for name in Job.__dataclass_fields__ if name != "user"]
+        return Job(user=None, **{name: data[name] for name in fields})
+
+    def submit(self, pdf_bytes: bytes, source: str, user: Optional[str] = None) -> Job:
+        path = f"/documents?source={quote(source)}"
+        if user:
+            path += f"&user={quote(user)}"
+        return self._job(self._request("POST", path, pdf_bytes))
+
+    def status(self, doc_id: str) -> Optional[Job]:
+        try:
+            return self._job(self._request("GET", f"/documents/{doc_id}"))
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return None
+            raise
+
+    def chunks(self, doc_id: str) -> List[Dict]:
+        return self._request("GET", f"/documents/{doc_id}/chunks")["chunks"]
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="CramIt PDF ingestion service.")
+    parser.add_argument("--host", default=os.getenv("INGEST_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("INGEST_PORT", "8000")))
+    parser.add_argument("--workers", type=int, default=4,
+                        help="ingestion job workers")
+    parser.add_argument("--parse-workers", type=int, default=None,
+                        help="parse/chunk worker processes (default: --workers)")
+    parser.add_argument("--upload-dir", default="uploads")
+    parser.add_argument("--db", default="cramit_ingest.db")
+    parser.add_argument("--plain-text", action="store_true",
+                        help="disable header/footer stripping")
+    args = parser.parse_args(argv)
+
+    service = IngestService(
+        upload_dir=args.upload_dir,
+        db_path=args.db,
+        workers=args.workers,
+        parse_workers=args.parse_workers,
+        layout_aware=not args.plain_text
+    )
+    server = IngestServer((args.host, args.port), service)
+    print(f"CramIt ingestion service on http://{args.host}:{args.port}")
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.shutdown()
+
+
+if __name__ == "__main__":
+    main()
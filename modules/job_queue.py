@@ -0,0 +1,557 @@
+# modules/job_queue.py
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+from modules.rate_limiter import user_context
+
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+@dataclass
+class Tool:
+    """
+    A unit of background work.
+
+    - expand: turns the submitted payload into (items, meta) once per job
+    - process: turns one item into a list of results
+    - cache_key: content key of an item; items with a known key reuse the
+      cached output across jobs (e.g. unchanged pages of a revised PDF)
+    - reuse: adapts a cached output to the item that hit it (e.g. re-stamps
+      the page number of a page that moved)
+    - finish: called with (payload, queue) once every item is done, before
+      the payload is dropped (e.g. to delete an uploaded file)
+    """
+    name: str
+    process: Callable[[Any], List]
+    expand: Optional[Callable[[Any], Tuple[List, Dict]]] = None
+    cache_key: Optional[Callable[[Any], str]] = None
+    reuse: Optional[Callable[[Any, List], List]] = None
+    finish: Optional[Callable[[Any, "JobQueue"], None]] = None
+
+
+@dataclass
+class Job:
+    job_id: str
+    tool: str
+    doc_hash: str
+    user: Optional[str]
+    state: str
+    done: int
+    total: int
+    error: Optional[str] = None
+    meta: Dict = field(default_factory=dict)
+
+    @property
+    def progress(self) -> float:
+        if not self.total:
+            return 1.0 if self.state == DONE else 0.0
+        return self.done / self.total
+
+    @property
+    def finished(self) -> bool:
+        return self.state in (DONE, FAILED)
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+class JobQueue:
+    """
+    Local background job subsystem backed by SQLite.
+
+    Jobs are deduplicated on (doc_hash, tool), processed item by item on a
+    worker pool, and resumed from the last finished item after a restart.
+    Finished jobs keep only their outputs, and are purged after
+    `retention_days`.
+
+    Several queues (processes) may share one database: a running job is
+    leased to its queue, which renews the lease while it is alive; only
+    jobs whose lease expired are taken over.
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        job_id     TEXT PRIMARY KEY,
+        tool       TEXT NOT NULL,
+        doc_hash   TEXT NOT NULL,
+        user       TEXT,
+        state      TEXT NOT NULL,
+        done       INTEGER NOT NULL DEFAULT 0,
+        total      INTEGER NOT NULL DEFAULT 0,
+        expanded   INTEGER NOT NULL DEFAULT 0,
+        owner      TEXT,
+        lease_until REAL,
+        payload    BLOB,
+        meta       TEXT,
+        error      TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        UNIQUE (doc_hash, tool)
+    );
+    CREATE TABLE IF NOT EXISTS job_items (
+        job_id TEXT NOT NULL,
+        idx    INTEGER NOT NULL,
+        input  TEXT NOT NULL,
+        output TEXT,
+        PRIMARY KEY (job_id, idx)
+    );
+    CREATE TABLE IF NOT EXISTS item_cache (
+        tool      TEXT NOT NULL,
+        item_key  TEXT NOT NULL,
+        page_hash TEXT,
+        output    TEXT NOT NULL,
+        PRIMARY KEY (tool, item_key)
+    );
+    CREATE INDEX IF NOT EXISTS item_cache_page ON item_cache (page_hash);
+    """
+
+    def __init__(
+        self,
+        tools: Dict[str, Tool],
+        db_path: str = "cramit_jobs.db",
+        max_workers: int = 4,
+        retention_days: float = 30,
+        lease_seconds: float = 60
+    ):
+        self.tools = tools
+        self.db_path = db_path
+        self.owner = uuid.uuid4().hex
+        self.lease_seconds = lease_seconds
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._pool = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="cramit-job"
+        )
+
+        with self._lock:
+            conn = self._conn()
+            conn.executescript(self.SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("lease_until", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            conn.commit()
+
+        self.purge(retention_days)
+        self.resume()
+
+        # renews our leases and takes over jobs of queues that died
+        self._stopped = threading.Event()
+        self._heartbeat = threading.Thread(
+            target=self._beat, name="cramit-job-heartbeat", daemon=True
+        )
+        self._heartbeat.start()
+
+    # ---------- storage ----------
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            self._local.conn = conn
+        return conn
+
+    def _execute(self, sql: str, params: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            conn = self._conn()
+            cursor = conn.execute(sql, params)
+            conn.commit()
+            return cursor
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Job:
+        return Job(
+            job_id=row["job_id"],
+            tool=row["tool"],
+            doc_hash=row["doc_hash"],
+            user=row["user"],
+            state=row["state"],
+            done=row["done"],
+            total=row["total"],
+            error=row["error"],
+            meta=json.loads(row["meta"]) if row["meta"] else {}
+        )
+
+    # ---------- main API ----------
+
+    def submit(
+        self,
+        tool: str,
+        doc_hash: str,
+        payload: Any = None,
+        user: Optional[str] = None
+    ) -> str:
+        """
+        Queues a job and returns its id.
+        An identical (doc_hash, tool) job is reused; a failed one is retried.
+        """
+        if tool not in self.tools:
+            raise ValueError(f"Unknown tool: {tool}")
+
+        with self._lock:
+            existing = self._execute(
+                "SELECT job_id, state FROM jobs WHERE doc_hash = ? AND tool = ?",
+                (doc_hash, tool)
+            ).fetchone()
+
+            if existing is not None:
+                if existing["state"] == FAILED:
+                    self._set_state(existing["job_id"], QUEUED, error=None)
+                    self._schedule(existing["job_id"])
+                return existing["job_id"]
+
+            job_id = uuid.uuid4().hex
+            now = time.time()
+            blob = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+
+            self._execute(
+                """
+                INSERT INTO jobs
+                    (job_id, tool, doc_hash, user, state, payload, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                (job_id, tool, doc_hash, user, QUEUED, blob, now, now)
+            )
+
+        self._schedule(job_id)
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Job]:
+        row = self._execute(
+            "SELECT * FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def find(self, doc_hash: str, tool: str) -> Optional[Job]:
+        """
+        The job of this tool for this document, whoever submitted it.
+        """
+        row = self._execute(
+            "SELECT * FROM jobs WHERE doc_hash = ? AND tool = ?", (doc_hash, tool)
+        ).fetchone()
+        return self._row_to_job(row) if row else None
+
+    def results(self, job_id: str) -> List:
+        """
+        Flattened outputs of all finished items so far, in item order.
+        Safe to call while the job is still running (partial results).
+        """
+        rows = self._execute(
+            """
+            SELECT output FROM job_items
+            WHERE job_id = ? AND output IS NOT NULL
+            ORDER BY idx
+            """,
+            (job_id,)
+        ).fetchall()
+
+        results = []
+        for row in rows:
+            results.extend(json.loads(row["output"]))
+        return results
+
+    def item_outputs(self, job_id: str) -> List[Optional[List]]:
+        """
+        Output of every item, in item order; None for unfinished items.
+        """
+        rows = self._execute(
+            "SELECT output FROM job_items WHERE job_id = ? ORDER BY idx",
+            (job_id,)
+        ).fetchall()
+        return [
+            json.loads(row["output"]) if row["output"] is not None else None
+            for row in rows
+        ]
+
+    def resume(self) -> None:
+        """
+        Re-schedules queued jobs and running jobs whose owner stopped
+        renewing its lease (a crashed process). Jobs a live queue is
+        running are left alone.
+        """
+        rows = self._execute(
+            "SELECT job_id FROM jobs WHERE state = ? ORDER BY created_at", (QUEUED,)
+        ).fetchall()
+
+        for row in rows:
+            self._schedule(row["job_id"])
+        self._take_over_stale()
+
+    def _take_over_stale(self) -> None:
+        rows = self._execute(
+            """
+            SELECT job_id FROM jobs
+            WHERE state = ? AND (lease_until IS NULL OR lease_until < ?)
+            ORDER BY created_at
+            """,
+            (RUNNING, time.time())
+        ).fetchall()
+
+        for row in rows:
+            self._schedule(row["job_id"])
+
+    def prune_pages(self, page_hashes) -> int:
+        """
+        Drops cached item outputs that came from the given (deleted) pages.
+        """
+        page_hashes = list(page_hashes)
+        if not page_hashes:
+            return 0
+
+        placeholders = ",".join("?" * len(page_hashes))
+        return self._execute(
+            f"DELETE FROM item_cache WHERE page_hash IN ({placeholders})",
+            tuple(page_hashes)
+        ).rowcount
+
+    def forget(self, doc_hash: str) -> int:
+        """
+        Deletes every job of a document (e.g. once nothing references it),
+        so a later upload of the same file starts from scratch.
+        """
+        with self._lock:
+            conn = self._conn()
+            conn.execute(
+                """
+                DELETE FROM job_items
+                WHERE job_id IN (SELECT job_id FROM jobs WHERE doc_hash = ?)
+                """,
+                (doc_hash,)
+            )
+            removed = conn.execute(
+                "DELETE FROM jobs WHERE doc_hash = ?", (doc_hash,)
+            ).rowcount
+            conn.commit()
+        return removed
+
+    def purge(self, older_than_days: float) -> int:
+        """
+        Deletes finished jobs (and their outputs) not touched for this long.
+        """
+        cutoff = time.time() - older_than_days * 24 * 60 * 60
+
+        with self._lock:
+            conn = self._conn()
+            conn.execute(
+                """
+                DELETE FROM job_items WHERE job_id IN (
+                    SELECT job_id FROM jobs WHERE state = ? AND updated_at < ?
+                )
+                """,
+                (DONE, cutoff)
+            )
+            removed = conn.execute(
+                "DELETE FROM jobs WHERE state = ? AND updated_at < ?",
+                (DONE, cutoff)
+            ).rowcount
+            conn.commit()
+        return removed
+
+    def shutdown(self, wait: bool = True) -> None:
+        self._stopped.set()
+        self._pool.shutdown(wait=wait)
+
+    # ---------- internals ----------
+
+    def _schedule(self, job_id: str) -> None:
+        self._pool.submit(self._run, job_id)
+
+    def _set_state(self, job_id: str, state: str, error: Optional[str] = None) -> None:
+        self._execute(
+            """
+            UPDATE jobs SET state = ?, error = ?, owner = NULL, lease_until = NULL, updated_at = ?
+            WHERE job_id = ?
+            """,
+            (state, error, time.time(), job_id)
+        )
+
+    def _claim(self, job_id: str) -> bool:
+        """
+        Leases a queued job (or one whose owner's lease ran out) to this queue.
+        """
+        now = time.time()
+        return bool(self._execute(
+            """
+            UPDATE jobs SET state = ?, owner = ?, lease_until = ?, updated_at = ?
+            WHERE job_id = ?
+              AND (state = ? OR (state = ? AND (lease_until IS NULL OR lease_until < ?)))
+            """,
+            (RUNNING, self.owner, now + self.lease_seconds, now, job_id, QUEUED, RUNNING, now)
+        ).rowcount)
+
+    def _fail(self, job_id: str, error: str) -> None:
+        # only while we still own it: a queue that took over keeps going
+        self._execute(
+            """
+            UPDATE jobs SET state = ?, error = ?, owner = NULL, lease_until = NULL, updated_at = ?
+            WHERE job_id = ? AND owner = ?
+            """,
+            (FAILED, error, time.time(), job_id, self.owner)
+        )
+
+    def _beat(self) -> None:
+        interval = self.lease_seconds / 3
+        while not self._stopped.wait(interval):
+            try:
+                self._execute(
+                    "UPDATE jobs SET lease_until = ? WHERE owner = ? AND state = ?",
+                    (time.time() + self.lease_seconds, self.owner, RUNNING)
+                )
+                self._take_over_stale()
+            except (sqlite3.Error, RuntimeError):
+                pass  # database busy, or the pool is shutting down: next beat
+
+    def _expand(self, job_id: str, row: sqlite3.Row, tool: Tool) -> None:
+        payload = row["payload"]
+
+        if tool.expand is not None:
+            items, meta = tool.expand(payload)
+        else:
+            items, meta = json.loads(payload), {}
+
+        with self._lock:
+            conn = self._conn()
+            conn.execute("DELETE FROM job_items WHERE job_id = ?", (job_id,))
+            conn.executemany(
+                "INSERT INTO job_items (job_id, idx, input) VALUES (?, ?, ?)",
+                [(job_id, i, json.dumps(item)) for i, item in enumerate(items)]
+            )
+            conn.execute(
+                """
+                UPDATE jobs
+                SET expanded = 1, total = ?, done = 0, meta = ?, updated_at = ?
+                WHERE job_id = ?
+                """,
+                (len(items), json.dumps(meta), time.time(), job_id)
+            )
+            conn.commit()
+
+    def _complete(self, job_id: str) -> None:
+        """
+        Marks a job done and drops what only a re-run would need:
+        the submitted payload and the item inputs (outputs are kept).
+        """
+        with self._lock:
+            conn = self._conn()
+            conn.execute(
+                "UPDATE job_items SET input = 'null' WHERE job_id = ?", (job_id,)
+            )
+            conn.execute(
+                """
+                UPDATE jobs
+                SET state = ?, error = NULL, payload = NULL, owner = NULL, lease_until = NULL,
+                    updated_at = ?
+                WHERE job_id = ?
+                """,
+                (DONE, time.time(), job_id)
+            )
+            conn.commit()
+
+    @staticmethod
+    def _page_hash(item: Any) -> Optional[str]:
+        if isinstance(item, dict):
+            return item.get("metadata", {}).get("page_hash")
+        return None
+
+    def _process_item(self, tool: Tool, item: Any) -> List:
+        if tool.cache_key is None:
+            return tool.process(item)
+
+        key = tool.cache_key(item)
+        cached = self._execute(
+            "SELECT output FROM item_cache WHERE tool = ? AND item_key = ?",
+            (tool.name, key)
+        ).fetchone()
+        if cached is not None:
+            output = json.loads(cached["output"])
+            return tool.reuse(item, output) if tool.reuse is not None else output
+
+        output = tool.process(item)
+        self._execute(
+            """
+            INSERT OR REPLACE INTO item_cache (tool, item_key, page_hash, output)
+            VALUES (?, ?, ?, ?)
+            """,
+            (tool.name, key, self._page_hash(item), json.dumps(output))
+        )
+        return output
+
+    def _run(self, job_id: str) -> None:
+        row = self._execute(
+            "SELECT * FROM jobs WHERE job_id = ?", (job_id,)
+        ).fetchone()
+
+        if row is None:
+            return
+
+        tool = self.tools.get(row["tool"])
+        if tool is None:
+            self._set_state(job_id, FAILED, error=f"Unknown tool: {row['tool']}")
+            return
+
+        if not self._claim(job_id):
+            return  # finished, or running under a live queue
+
+        try:
+            if not row["expanded"]:
+                self._expand(job_id, row, tool)
+
+            pending = self._execute(
+                """
+                SELECT idx, input FROM job_items
+                WHERE job_id = ? AND output IS NULL
+                ORDER BY idx
+                """,
+                (job_id,)
+            ).fetchall()
+
+            for item in pending:
+                # LLM calls made by the tool are queued fairly under the job's user
+                with user_context(row["user"]):
+                    output = self._process_item(tool, json.loads(item["input"]))
+
+                with self._lock:
+                    conn = self._conn()
+                    written = conn.execute(
+                        """
+                        UPDATE job_items SET output = ?
+                        WHERE job_id = ? AND idx = ? AND output IS NULL
+                        """,
+                        (json.dumps(output), job_id, item["idx"])
+                    ).rowcount
+                    if written:
+                        conn.execute(
+                            "UPDATE jobs SET done = done + 1, updated_at = ? WHERE job_id = ?",
+                            (time.time(), job_id)
+                        )
+                    owner = conn.execute(
+                        "SELECT owner FROM jobs WHERE job_id = ?", (job_id,)
+                    ).fetchone()
+                    conn.commit()
+
+                if owner is None or owner["owner"] != self.owner:
+                    return  # our lease expired and another queue took over
+
+            if tool.finish is not None:
+                tool.finish(row["payload"], self)
+
+            self._complete(job_id)
+
+        except Exception as e:
+            # finished items keep their output, so a retry resumes from here
+            self._fail(job_id, str(e))
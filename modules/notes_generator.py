@@ -2,6 +2,8 @@ from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
 import os
 
+from modules.rate_limiter import get_rate_limiter, estimate_tokens
+
 # ---------------------------
 # Gemini LLM
 # ---------------------------
@@ -9,6 +11,7 @@ llm = ChatGoogleGenerativeAI(
     model="gemini-1.5-flash",
     temperature=0.3,
     google_api_key=os.getenv("GEMINI_API_KEY"),
+    max_retries=0,  # the shared rate limiter retries and backs off
 )
 
 # ---------------------------
@@ -41,14 +44,20 @@ notes_chain = prompt | llm
 # ---------------------------
 # Public API
 # ---------------------------
-def generate_notes_from_chunks(chunks):
+def generate_notes_from_chunks(chunks, user=None):
     """
     Generates bullet-point study notes from text chunks.
+    Every call goes through the shared Gemini rate limiter (with retries).
     """
+    limiter = get_rate_limiter()
     notes = []
 
     for chunk in chunks:
-        response = notes_chain.invoke({"chunk": chunk})
+        response = limiter.call(
+            lambda: notes_chain.invoke({"chunk": chunk}),
+            user=user,
+            tokens=estimate_tokens(NOTES_PROMPT + str(chunk))
+        )
         notes.append(response.content.strip())
 
     return notes
@@ -1,17 +1,48 @@
 # modules/pdf_parser.py
 
-from typing import List, Dict
+from typing import List, Dict, Tuple
+from collections import Counter
+import re
+
 import fitz  # PyMuPDF
+import tiktoken
+
+from modules.revisions import page_hash
 
 
 class PDFParser:
     """
     Robust PDF parser that extracts page-level text
     with rich metadata for high-quality RAG pipelines.
+
+    layout_aware=True reads PyMuPDF's dict output and drops boilerplate that
+    repeats at the same position across pages before it reaches chunks,
+    embeddings and prompts:
+    - blocks inside the top/bottom margin bands: per line, digits masked
+      (running headers, page numbers, course codes)
+    - body blocks: only whole blocks of min_body_chars or more that repeat
+      verbatim (copyright notices, slide templates); body lines never are
     """
 
-    def __init__(self):
-        pass
+    def __init__(
+        self,
+        layout_aware: bool = False,
+        keep_structure: bool = False,
+        min_repeat_pages: int = 3,
+        min_repeat_ratio: float = 0.5,
+        heading_scale: float = 1.25,
+        margin: float = 0.12,
+        min_body_chars: int = 25,
+        tokenizer_model: str = "gpt-4o-mini"  # tokenizer proxy only
+    ):
+        self.layout_aware = layout_aware
+        self.keep_structure = keep_structure
+        self.min_repeat_pages = min_repeat_pages
+        self.min_repeat_ratio = min_repeat_ratio
+        self.heading_scale = heading_scale
+        self.margin = margin
+        self.min_body_chars = min_body_chars
+        self.tokenizer = tiktoken.encoding_for_model(tokenizer_model)
 
     def parse(self, pdf_bytes: bytes, source_name: str) -> List[Dict]:
         """
@@ -24,12 +55,90 @@ class PDFParser:
                 "text": str,
                 "metadata": {
                     "source": str,
-                    "page_number": int
+                    "page": int,
+                    "page_hash": str
                 }
             }
         ]
         """
+        pages, _ = self.parse_with_report(pdf_bytes, source_name)
+        return pages
+
+    def parse_with_report(
+        self,
+        pdf_bytes: bytes,
+        source_name: str
+    ) -> Tuple[List[Dict], Dict]:
+        """
+        Same as parse(), plus a report of how many tokens boilerplate
+        stripping removed from the document.
+        """
         doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+
+        if self.layout_aware:
+            pages, report = self._parse_layout(doc, source_name)
+        else:
+            pages = self._parse_plain(doc, source_name)
+            tokens = sum(self._token_len(page["text"]) for page in pages)
+            report = self._report(len(pages), 0, tokens, tokens)
+
+        doc.close()
+        return pages, report
+
+    # ---------- helpers ----------
+
+    def _token_len(self, text: str) -> int:
+        return len(self.tokenizer.encode(text))
+
+    @staticmethod
+    def _build_page(page_index: int, text: str, source_name: str) -> Dict:
+        return {
+            "page_id": page_index,
+            "text": text,
+            "metadata": {
+                "source": source_name,
+                "page": page_index + 1,
+                "page_hash": page_hash(text)
+            }
+        }
+
+    @staticmethod
+    def _report(pages: int, lines_removed: int, before: int, after: int) -> Dict:
+        return {
+            "pages": pages,
+            "lines_removed": lines_removed,
+            "tokens_before": before,
+            "tokens_after": after,
+            "tokens_saved": before - after,
+            "reduction": round((before - after) / before, 3) if before else 0.0
+        }
+
+    def _in_margin(self, bbox: Tuple[float, ...], height: float) -> bool:
+        """
+        True if a block lies entirely in the header or footer band.
+        """
+        if not height:
+            return False
+        return bbox[3] <= self.margin * height or bbox[1] >= (1 - self.margin) * height
+
+    @staticmethod
+    def _position_key(text: str, y: float, height: float) -> Tuple[str, int]:
+        """
+        Position-aware fingerprint, bucketed to 2% of the page height.
+        """
+        position = y / height if height else 0.0
+        return " ".join(text.lower().split()), round(position * 50)
+
+    def _margin_key(self, text: str, y: float, height: float) -> Tuple[str, int]:
+        """
+        Header/footer lines: digits masked so "Page 3 of 20" and
+        "Page 4 of 20" collide.
+        """
+        return self._position_key(re.sub(r"\d+", "#", text), y, height)
+
+    # ---------- extraction modes ----------
+
+    def _parse_plain(self, doc, source_name: str) -> List[Dict]:
         pages = []
 
         for page_index in range(len(doc)):
@@ -39,14 +148,124 @@ class PDFParser:
             if not text:
                 continue  # skip empty pages safely
 
-            pages.append({
-                "page_id": page_index,
-                "text": text,
-                "metadata": {
-                    "source": source_name,
-                    "page": page_index + 1
-                }
-            })
+            pages.append(self._build_page(page_index, text, source_name))
 
-        doc.close()
         return pages
+
+    def _parse_layout(self, doc, source_name: str) -> Tuple[List[Dict], Dict]:
+        # pass 1: collect positioned lines per page
+        page_lines = []
+        span_sizes = Counter()
+
+        for page_index in range(len(doc)):
+            page = doc.load_page(page_index)
+            height = page.rect.height
+            lines = []
+
+            for block_index, block in enumerate(page.get_text("dict")["blocks"]):
+                if block.get("type") != 0:
+                    continue  # images
+
+                in_margin = self._in_margin(block["bbox"], height)
+                block_lines = []
+
+                for line in block["lines"]:
+                    spans = [span for span in line["spans"] if span["text"].strip()]
+                    if not spans:
+                        continue
+
+                    text = "".join(span["text"] for span in spans).strip()
+                    size = max(span["size"] for span in spans)
+                    for span in spans:
+                        span_sizes[round(span["size"], 1)] += len(span["text"])
+
+                    block_lines.append({
+                        "block": block_index,
+                        "text": text,
+                        "size": size,
+                        "key": self._margin_key(text, line["bbox"][1], height) if in_margin else None
+                    })
+
+                # body text only goes as a whole block that repeats verbatim
+                block_text = " ".join(line["text"] for line in block_lines)
+                if not in_margin and len(block_text) >= self.min_body_chars:
+                    key = self._position_key(block_text, block["bbox"][1], height)
+                    for line in block_lines:
+                        line["key"] = key
+
+                lines.extend(block_lines)
+
+            page_lines.append(lines)
+
+        # pass 2: keys repeated at the same position on many pages are boilerplate
+        key_pages = Counter()
+        for lines in page_lines:
+            key_pages.update({line["key"] for line in lines if line["key"] is not None})
+
+        threshold = max(
+            self.min_repeat_pages,
+            self.min_repeat_ratio * len(page_lines)
+        )
+        boilerplate = {key for key, count in key_pages.items() if count >= threshold}
+
+        body_size = self._weighted_median(span_sizes)
+
+        # pass 3: rebuild page text without boilerplate
+        pages = []
+        lines_removed = 0
+        tokens_before = 0
+        tokens_after = 0
+
+        for page_index, lines in enumerate(page_lines):
+            kept = [line for line in lines if line["key"] not in boilerplate]
+            lines_removed += len(lines) - len(kept)
+
+            raw_text = "\n".join(line["text"] for line in lines)
+            text = self._join_blocks(kept)
+            tokens_before += self._token_len(raw_text)
+
+            if not text:
+                continue  # skip empty pages safely
+
+            tokens_after += self._token_len(text)
+            built = self._build_page(page_index, text, source_name)
+
+            if self.keep_structure:
+                built["metadata"]["headings"] = [
+                    line["text"] for line in kept
+                    if body_size and line["size"] >= body_size * self.heading_scale
+                ]
+
+            pages.append(built)
+
+        report = self._report(len(pages), lines_removed, tokens_before, tokens_after)
+        return pages, report
+
+    @staticmethod
+    def _weighted_median(counts: Counter) -> float:
+        """
+        Font size covering the middle character of the document (body text).
+        """
+        total = sum(counts.values())
+        seen = 0
+        for size in sorted(counts):
+            seen += counts[size]
+            if seen * 2 >= total:
+                return size
+        return 0.0
+
+    @staticmethod
+    def _join_blocks(lines: List[Dict]) -> str:
+        """
+        Lines within a block are joined by newlines, blocks by blank lines.
+        """
+        blocks = []
+        current_block = None
+
+        for line in lines:
+            if line["block"] != current_block:
+                blocks.append([])
+                current_block = line["block"]
+            blocks[-1].append(line["text"])
+
+        return "\n\n".join("\n".join(block) for block in blocks).strip()
@@ -1,18 +1,86 @@
 import os
-from typing import List, Dict
+import re
+import hashlib
+import inspect
+import threading
+from collections import Counter
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import List, Dict, Tuple
 
+import numpy as np
 from langchain_google_genai import (
     ChatGoogleGenerativeAI,
     GoogleGenerativeAIEmbeddings,
 )
 
 from langchain_chroma import Chroma
+from langchain_chroma.vectorstores import maximal_marginal_relevance
 
 from langchain_core.prompts import PromptTemplate
 from langchain_core.documents import Document
-from langchain_core.runnables import RunnablePassthrough
+from langchain_core.embeddings import Embeddings
 
 from modules.rag_evaluator import RAGEvaluator
+from modules.dedup import ChunkDeduplicator
+from modules.rate_limiter import (
+    RateLimiter,
+    get_rate_limiter,
+    estimate_tokens,
+    user_context,
+)
+
+
+# Texts per embedding request (the Gemini batch endpoint's limit)
+EMBED_BATCH_SIZE = 100
+
+
+class RateLimitedEmbeddings(Embeddings):
+    """
+    Routes every embedding request through the shared rate limiter.
+    """
+
+    def __init__(self, inner: Embeddings, limiter: RateLimiter):
+        self.inner = inner
+        self.limiter = limiter
+
+    def _batched(self, texts: List[str], **kwargs) -> List[List[float]]:
+        """
+        One limiter call per request the SDK actually sends, so RPM/TPM
+        budgets see every request.
+        """
+        vectors = []
+        for i in range(0, len(texts), EMBED_BATCH_SIZE):
+            batch = texts[i:i + EMBED_BATCH_SIZE]
+            vectors.extend(self.limiter.call(
+                lambda: self.inner.embed_documents(batch, **kwargs),
+                tokens=sum(estimate_tokens(t) for t in batch)
+            ))
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._batched(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.limiter.call(
+            lambda: self.inner.embed_query(text),
+            tokens=estimate_tokens(text)
+        )
+
+    def embed_queries(self, texts: List[str]) -> List[List[float]]:
+        """
+        Batched query embeddings: one request per EMBED_BATCH_SIZE questions
+        instead of one per question.
+        """
+        kwargs = {}
+        if "task_type" in inspect.signature(self.inner.embed_documents).parameters:
+            kwargs["task_type"] = "retrieval_query"
+
+        return self._batched(texts, **kwargs)
+
+
+NOT_FOUND_ANSWER = "I could not find this information in the provided document."
+
+
 class QAEngine:
     """
     Production-grade RAG Question Answering Engine using:
@@ -20,10 +88,23 @@ class QAEngine:
     - ChromaDB (vector store)
     - MMR retrieval
     - System-level RAG evaluation
+    - Pre-generation grounding gate (skips the LLM on weak retrieval)
     """
 
-    def __init__(self, persist_dir: str = "chroma_db"):
+    def __init__(
+        self,
+        persist_dir: str = "chroma_db",
+        min_similarity: float | None = None
+    ):
         try:
+            # Gate: if no retrieved chunk reaches this cosine similarity to
+            # the question we answer "not found" without the LLM
+            self.min_similarity = (
+                min_similarity if min_similarity is not None
+                else float(os.getenv("QA_MIN_SIMILARITY", "0.55"))
+            )
+            self._gate_stats = {"checked": 0, "gated": 0}
+
             self.api_key = os.getenv("GEMINI_API_KEY")
             if not self.api_key:
                 raise ValueError("GEMINI_API_KEY not found")
@@ -33,12 +114,19 @@ class QAEngine:
                 model="gemini-1.5-flash",
                 temperature=0.2,
                 google_api_key=self.api_key,
+                max_retries=0,  # the shared rate limiter retries and backs off
             )
 
+            # Shared limiter for every Gemini call (LLM + embeddings)
+            self.limiter = get_rate_limiter()
+
             # Embeddings
-            self.embeddings = GoogleGenerativeAIEmbeddings(
-                model="models/embedding-001",
-                google_api_key=self.api_key,
+            self.embeddings = RateLimitedEmbeddings(
+                GoogleGenerativeAIEmbeddings(
+                    model="models/embedding-001",
+                    google_api_key=self.api_key,
+                ),
+                self.limiter,
             )
 
             # Vector store
@@ -47,27 +135,39 @@ class QAEngine:
                 embedding_function=self.embeddings,
             )
 
-            # Retriever (MMR)
-            self.retriever = self.vectorstore.as_retriever(
-                search_type="mmr",
-                search_kwargs={
-                    "k": 6,
-                    "fetch_k": 20,
-                    "lambda_mult": 0.7,
-                },
-            )
+            # MMR retrieval, always filtered to one document (see _retrieve)
+            self.search_kwargs = {
+                "k": 6,
+                "fetch_k": 20,
+                "lambda_mult": 0.7,
+            }
 
             self.qa_chain = self._build_qa_chain()
 
             # RAG evaluator
             self.evaluator = RAGEvaluator(min_chunks=2)
 
+            # Near-duplicate suppression before embedding
+            self.deduplicator = ChunkDeduplicator()
+
+            # Answers by document, then normalized question (filled by
+            # ask/ask_many/prewarm); retrieval never leaves the document, so
+            # an answer is valid for anyone who uploaded that exact PDF
+            self._answer_cache: Dict[str, Dict[str, Dict]] = {}
+            self._cache_lock = threading.Lock()
+            self._background = ThreadPoolExecutor(
+                max_workers=1,
+                thread_name_prefix="cramit-prewarm"
+            )
+
         except Exception as e:
             raise RuntimeError(f"[QAEngine Init Error] {str(e)}")
 
     def _build_qa_chain(self):
         """
-        Pure LCEL-based RAG chain (2025 safe)
+        Pure LCEL-based answer chain (2025 safe).
+        Retrieval happens before it, so the LLM call can be rate limited
+        on its own and the retrieved docs are reused for evaluation.
         """
 
         prompt = PromptTemplate(
@@ -77,7 +177,7 @@ You are an academic assistant.
 
 Answer the question ONLY using the context below.
 If the answer is not present in the context, say:
-"I could not find this information in the provided document."
+"{not_found}"
 
 Context:
 {context}
@@ -87,68 +187,417 @@ Question:
 
 Answer (clear, concise, grounded):
 """,
+            partial_variables={"not_found": NOT_FOUND_ANSWER},
         )
 
-        def format_docs(docs: List[Document]) -> str:
-            return "\n\n".join(doc.page_content for doc in docs)
+        return prompt | self.llm
 
-        chain = (
-            {
-                "context": self.retriever | format_docs,
-                "question": RunnablePassthrough(),
-            }
-            | prompt
-            | self.llm
+    @staticmethod
+    def _format_docs(docs: List[Document]) -> str:
+        return "\n\n".join(doc.page_content for doc in docs)
+
+    def add_chunks(self, chunks: List[Dict], doc_id: str) -> Dict:
+        """
+        Embeds a document's chunks into the vector store, once per
+        near-duplicate cluster. Vectors belong to `doc_id` (retrieval never
+        crosses documents), but text already embedded for any document
+        (same page, same text) is copied instead of re-embedded.
+        Returns dedup stats (including chunks whose embedding was saved).
+        """
+        result = self.deduplicator.cluster(chunks)
+        cluster_sizes = Counter(result.assignment)
+
+        candidates = {}
+        for cluster, idx in enumerate(result.representatives):
+            chunk = chunks[idx]
+            content_id = self._content_id(chunk)
+            candidates.setdefault(
+                self._chunk_id(doc_id, content_id),
+                (content_id, chunk, cluster_sizes[cluster])
+            )
+
+        existing = set()
+        if candidates:
+            existing = set(
+                self.vectorstore.get(ids=list(candidates), include=[])["ids"]
+            )
+
+        missing = {
+            chunk_id: candidate for chunk_id, candidate in candidates.items()
+            if chunk_id not in existing
+        }
+        stored = self._stored_embeddings(
+            {content_id for content_id, _, _ in missing.values()}
         )
 
-        return chain
+        texts, metadatas, ids = [], [], []
+        copied = {"ids": [], "embeddings": [], "metadatas": [], "documents": []}
+
+        for chunk_id, (content_id, chunk, cluster_size) in missing.items():
+            # Chroma metadata must be scalar and non-null
+            metadata = {
+                k: v for k, v in chunk["metadata"].items()
+                if v is not None
+            }
+            metadata["duplicates"] = metadata.get("duplicates", 0) + cluster_size - 1
+            metadata["doc_id"] = doc_id
+            metadata["content_id"] = content_id
+
+            if content_id in stored:
+                copied["ids"].append(chunk_id)
+                copied["embeddings"].append(stored[content_id])
+                copied["metadatas"].append(metadata)
+                copied["documents"].append(chunk["text"])
+            else:
+                texts.append(chunk["text"])
+                metadatas.append(metadata)
+                ids.append(chunk_id)
+
+        if copied["ids"]:
+            self.vectorstore._collection.upsert(**copied)
+        if texts:
+            self.vectorstore.add_texts(texts=texts, metadatas=metadatas, ids=ids)
+        if missing:
+            self._clear_answer_cache(doc_id)  # answers may now have better evidence
 
-    def ask(self, question: str) -> Dict:
+        stats = result.stats
+        stats["embeddings_saved"] += len(candidates) - len(texts)
+        stats["reused"] = len(existing) + len(copied["ids"])
+        return stats
+
+    def remove_document(self, doc_id: str) -> int:
         """
-        Ask a question over the document corpus.
+        Deletes a document's vectors (once nothing references it any more).
+        """
+        ids = self.vectorstore.get(where={"doc_id": doc_id}, include=[])["ids"]
+        if ids:
+            self.vectorstore.delete(ids=ids)
+        self._clear_answer_cache(doc_id)
+        return len(ids)
+
+    @staticmethod
+    def _content_id(chunk: Dict) -> str:
+        """
+        Content-addressed key: same page + same text always embeds the same.
+        """
+        key = f"{chunk['metadata'].get('page_hash') or ''}:{chunk['text']}"
+        return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    def _chunk_id(doc_id: str, content_id: str) -> str:
+        return hashlib.sha256(f"{doc_id}:{content_id}".encode("utf-8")).hexdigest()
+
+    def _stored_embeddings(self, content_ids) -> Dict[str, List[float]]:
+        """
+        Embeddings already computed for these contents (for any document).
+        """
+        content_ids = list(content_ids)
+        found = {}
+
+        for start in range(0, len(content_ids), 500):
+            stored = self.vectorstore.get(
+                where={"content_id": {"$in": content_ids[start:start + 500]}},
+                include=["embeddings", "metadatas"]
+            )
+            for metadata, embedding in zip(stored["metadatas"], stored["embeddings"]):
+                found.setdefault(metadata["content_id"], embedding)
+
+        return found
+
+    def ask(self, question: str, doc_id: str, user: str | None = None) -> Dict:
+        """
+        Ask a question about one indexed document.
         """
 
         if not question or not question.strip():
-            return {
-                "answer": "Please provide a valid question.",
-                "sources": [],
-                "rag_confidence": 0.0,
-                "status": "fail",
-            }
+            return self._invalid_question()
+
+        cached = self._cached_answer(question, doc_id)
+        if cached is not None:
+            return cached
 
         try:
-            llm_response = self.qa_chain.invoke(question)
-            answer = llm_response.content.strip()
+            with user_context(user):
+                # retrieve once: the same docs feed the gate, prompt, evaluator and sources
+                query_vector = self.embeddings.embed_query(question)
+            retrieved = self._retrieve(query_vector, doc_id)
+            return self._answer(question, doc_id, retrieved, user)
+
+        except Exception as e:
+            return self._error(e)
 
-            # retrieve docs separately for evaluator + sources
-            source_docs: List[Document] = self.retriever.invoke(question)
+    def ask_many(
+        self,
+        questions: List[str],
+        doc_id: str,
+        user: str | None = None,
+        max_workers: int = 4
+    ) -> List[Dict]:
+        """
+        Answers a batch of questions about one document
+        (e.g. a practice-question answer key).
 
-            sources = self._extract_sources(source_docs)
+        - query embeddings are computed in one batched call
+        - retrievals run against the store concurrently
+        - LLM answers run with at most `max_workers` in flight
+        Results come back in input order and land in the answer cache.
+        """
+        results: List[Dict | None] = [None] * len(questions)
+        todo: Dict[str, List[int]] = {}
 
-            retrieved_chunks = [
-                {"text": doc.page_content, "metadata": doc.metadata}
-                for doc in source_docs
-            ]
+        for i, question in enumerate(questions):
+            if not question or not question.strip():
+                results[i] = self._invalid_question()
+                continue
 
-            eval_result = self.evaluator.evaluate(
-                retrieved_chunks=retrieved_chunks,
-                answer=answer,
-            )
+            cached = self._cached_answer(question, doc_id)
+            if cached is not None:
+                results[i] = cached
+            else:
+                # identical questions are answered once
+                todo.setdefault(self._cache_key(question), []).append(i)
 
-            return {
-                "answer": answer,
-                "sources": sources,
-                "rag_confidence": eval_result.get("confidence_score", 0.0),
-                "status": eval_result.get("status", "fail"),
-            }
+        if not todo:
+            return results
 
+        pending = [questions[indices[0]] for indices in todo.values()]
+
+        try:
+            with user_context(user):
+                query_vectors = self.embeddings.embed_queries(pending)
         except Exception as e:
-            return {
-                "answer": f"Error generating answer: {str(e)}",
-                "sources": [],
-                "rag_confidence": 0.0,
+            for indices in todo.values():
+                for i in indices:
+                    results[i] = self._error(e)
+            return results
+
+        def retrieve(vector: List[float]) -> List[Tuple[Document, float]] | Exception:
+            try:
+                return self._retrieve(vector, doc_id)
+            except Exception as e:
+                return e
+
+        def answer(
+            question: str,
+            docs: List[Tuple[Document, float]] | Exception
+        ) -> Dict:
+            if isinstance(docs, Exception):
+                return self._error(docs)
+            try:
+                return self._answer(question, doc_id, docs, user)
+            except Exception as e:
+                return self._error(e)
+
+        # local store lookups: run them all at once
+        with ThreadPoolExecutor(
+            max_workers=min(len(pending), 16),
+            thread_name_prefix="cramit-retrieve"
+        ) as pool:
+            retrieved = list(pool.map(retrieve, query_vectors))
+
+        # LLM calls: bounded here, and globally by the shared rate limiter
+        with ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix="cramit-ask"
+        ) as pool:
+            answers = list(pool.map(answer, pending, retrieved))
+
+        for indices, result in zip(todo.values(), answers):
+            for i in indices:
+                results[i] = result
+
+        return results
+
+    def prewarm(
+        self,
+        questions: List[str],
+        doc_id: str,
+        user: str | None = None
+    ) -> Future:
+        """
+        Pre-answers questions about an indexed document in the background,
+        so they later return instantly.
+        """
+        def run() -> List[Dict]:
+            # background threads don't inherit the caller's user context
+            with user_context(user):
+                return self.ask_many(questions, doc_id, user=user)
+
+        return self._background.submit(run)
+
+    def gate_metrics(self) -> Dict:
+        """
+        How often the pre-generation gate skipped the LLM.
+        """
+        with self._cache_lock:
+            stats = dict(self._gate_stats)
+        stats["gate_rate"] = (
+            round(stats["gated"] / stats["checked"], 3) if stats["checked"] else 0.0
+        )
+        return stats
+
+    # ---------- internals ----------
+
+    def _retrieve(
+        self,
+        query_vector: List[float],
+        doc_id: str
+    ) -> List[Tuple[Document, float]]:
+        """
+        MMR over the document's closest chunks, each with its cosine
+        similarity to the question (what the gate judges).
+        """
+        found = self.vectorstore._collection.query(
+            query_embeddings=[query_vector],
+            n_results=self.search_kwargs["fetch_k"],
+            where={"doc_id": doc_id},
+            include=["documents", "metadatas", "embeddings"]
+        )
+        if not found["ids"] or not found["ids"][0]:
+            return []
+
+        query = np.asarray(query_vector, dtype=np.float32)
+        candidates = np.asarray(found["embeddings"][0], dtype=np.float32)
+        norms = np.linalg.norm(candidates, axis=1) * np.linalg.norm(query)
+        similarities = candidates @ query / np.where(norms == 0, 1.0, norms)
+
+        selected = maximal_marginal_relevance(
+            query,
+            candidates,
+            k=self.search_kwargs["k"],
+            lambda_mult=self.search_kwargs["lambda_mult"]
+        )
+        return [
+            (
+                Document(
+                    page_content=found["documents"][0][i],
+                    metadata=found["metadatas"][0][i] or {}
+                ),
+                float(similarities[i])
+            )
+            for i in selected
+        ]
+
+    def _gate(self, retrieved_chunks: List[Dict], similarities: List[float]) -> Dict:
+        """
+        Cheap grounding check before generation: passes only if some
+        retrieved chunk is close enough to the question itself.
+        Returns the retrieval diagnostics plus whether the LLM should run.
+        """
+        diagnostics = self.evaluator.evaluate_retrieval(retrieved_chunks)
+
+        top = max(similarities, default=0.0)
+        if similarities:
+            diagnostics["top_similarity"] = round(top, 4)
+            diagnostics["mean_similarity"] = round(float(np.mean(similarities)), 4)
+
+        passed = bool(similarities) and top >= self.min_similarity
+        if similarities and not passed:
+            diagnostics["reason"] = (
+                f"Closest chunk similarity {top:.3f} below {self.min_similarity}"
+            )
+
+        with self._cache_lock:
+            self._gate_stats["checked"] += 1
+            if not passed:
+                self._gate_stats["gated"] += 1
+
+        diagnostics["passed"] = passed
+        return diagnostics
+
+    def _answer(
+        self,
+        question: str,
+        doc_id: str,
+        retrieved: List[Tuple[Document, float]],
+        user: str | None
+    ) -> Dict:
+        """
+        Gate, then LLM answer + evaluation for already retrieved docs.
+        Caches the result.
+        """
+        source_docs = [doc for doc, _ in retrieved]
+        retrieved_chunks = [
+            {"text": doc.page_content, "metadata": doc.metadata}
+            for doc in source_docs
+        ]
+
+        gate = self._gate(retrieved_chunks, [similarity for _, similarity in retrieved])
+        if not gate["passed"]:
+            # the prompt would force this answer anyway; don't pay for it
+            result = {
+                "answer": NOT_FOUND_ANSWER,
+                "sources": self._extract_sources(source_docs),
+                "rag_confidence": gate.get("confidence_score", 0.0),
                 "status": "fail",
+                "gated": True,
+                "diagnostics": gate,
             }
+            self._store_answer(question, doc_id, result)
+            return result
+
+        context = self._format_docs(source_docs)
+
+        llm_response = self.limiter.call(
+            lambda: self.qa_chain.invoke(
+                {"context": context, "question": question}
+            ),
+            user=user,
+            tokens=estimate_tokens(context + question)
+        )
+        answer = llm_response.content.strip()
+
+        sources = self._extract_sources(source_docs)
+
+        eval_result = self.evaluator.evaluate(
+            retrieved_chunks=retrieved_chunks,
+            answer=answer,
+        )
+
+        result = {
+            "answer": answer,
+            "sources": sources,
+            "rag_confidence": eval_result.get("confidence_score", 0.0),
+            "status": eval_result.get("status", "fail"),
+        }
+
+        self._store_answer(question, doc_id, result)
+        return result
+
+    @staticmethod
+    def _cache_key(question: str) -> str:
+        return re.sub(r"[\s?.!]+", " ", question.lower()).strip()
+
+    def _cached_answer(self, question: str, doc_id: str) -> Dict | None:
+        with self._cache_lock:
+            cached = self._answer_cache.get(doc_id, {}).get(self._cache_key(question))
+        return {**cached, "cached": True} if cached is not None else None
+
+    def _store_answer(self, question: str, doc_id: str, result: Dict) -> None:
+        with self._cache_lock:
+            self._answer_cache.setdefault(doc_id, {})[self._cache_key(question)] = result
+
+    def _clear_answer_cache(self, doc_id: str) -> None:
+        with self._cache_lock:
+            self._answer_cache.pop(doc_id, None)
+
+    @staticmethod
+    def _invalid_question() -> Dict:
+        return {
+            "answer": "Please provide a valid question.",
+            "sources": [],
+            "rag_confidence": 0.0,
+            "status": "fail",
+        }
+
+    @staticmethod
+    def _error(e: Exception) -> Dict:
+        return {
+            "answer": f"Error generating answer: {str(e)}",
+            "sources": [],
+            "rag_confidence": 0.0,
+            "status": "fail",
+        }
 
     @staticmethod
     def _extract_sources(docs: List[Document]) -> List[str]:
@@ -1,14 +1,18 @@
 import os
+import re
 from typing import List
 
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+
+from modules.rate_limiter import get_rate_limiter, estimate_tokens
 # LLM
 llm = ChatGoogleGenerativeAI(
     model="gemini-1.5-flash",
     temperature=0.4,
     google_api_key=os.getenv("GEMINI_API_KEY"),
+    max_retries=0,  # the shared rate limiter retries and backs off
 )
 
 QUESTION_PROMPT = """
@@ -37,11 +41,32 @@ prompt = PromptTemplate(
 question_chain = prompt | llm | StrOutputParser()
 
 
-def generate_questions_from_chunks(chunks: List[str]) -> List[str]:
+def generate_questions_from_chunks(chunks: List[str], user: str | None = None) -> List[str]:
+    limiter = get_rate_limiter()
     questions = []
 
     for chunk in chunks:
-        result = question_chain.invoke({"chunk": chunk})
+        result = limiter.call(
+            lambda: question_chain.invoke({"chunk": chunk}),
+            user=user,
+            tokens=estimate_tokens(QUESTION_PROMPT + str(chunk))
+        )
         questions.append(result.strip())
 
     return questions
+
+
+def split_questions(generated: List[str]) -> List[str]:
+    """
+    Splits numbered generator output ("1. [Knowledge] ...") into plain questions.
+    """
+    questions = []
+
+    for block in generated:
+        for line in block.splitlines():
+            line = line.replace("**", "")  # markdown bold around numbers/tags
+            match = re.match(r"^\s*\d+[.)]\s*(?:\[[^\]]*\]\s*)?(.+)$", line)
+            if match and match.group(1).strip():
+                questions.append(match.group(1).strip())
+
+    return questions
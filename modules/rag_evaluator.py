@@ -21,6 +21,13 @@ class RAGEvaluator:
         """
         Returns a confidence score + diagnostics.
         """
+        return self.evaluate_retrieval(retrieved_chunks)
+
+    def evaluate_retrieval(self, retrieved_chunks: List[Dict]) -> Dict:
+        """
+        Grounding signals from the retrieved chunks alone.
+        Cheap enough to run before generation as a gate.
+        """
 
         if not retrieved_chunks:
             return self._fail("No chunks retrieved")
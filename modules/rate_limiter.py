@@ -0,0 +1,254 @@
+# modules/rate_limiter.py
+
+from typing import Callable, Iterator, Optional, TypeVar
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+import os
+import random
+import re
+import threading
+import time
+
+
+T = TypeVar("T")
+
+ANONYMOUS = "anonymous"
+
+# User the current thread is working for (set by job workers and the UI)
+_current_user: ContextVar[str] = ContextVar("cramit_user", default=ANONYMOUS)
+
+_RETRYABLE_MESSAGE = re.compile(
+    r"\b(429|500|502|503|504)\b|resource.?exhausted|quota|rate.?limit|unavailable|overloaded",
+    re.IGNORECASE
+)
+
+
+@contextmanager
+def user_context(user: Optional[str]) -> Iterator[None]:
+    """
+    Attributes every limited call made inside the block to `user`
+    (None keeps whoever the surrounding code is working for).
+    """
+    token = _current_user.set(user or _current_user.get())
+    try:
+        yield
+    finally:
+        _current_user.reset(token)
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    Cheap token estimate for budgeting (~4 characters per token).
+    """
+    return max(1, len(text) // 4)
+
+
+def status_code(exc: BaseException) -> Optional[int]:
+    """
+    Best-effort HTTP status of an API error (google-api-core, httpx, urllib).
+    """
+    for candidate in (
+        getattr(exc, "status_code", None),
+        getattr(exc, "code", None),
+        getattr(getattr(exc, "response", None), "status_code", None),
+    ):
+        if isinstance(candidate, int):
+            return candidate
+    return None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    """
+    Quota (429) and server-side (5xx) errors are worth retrying; others are not.
+    """
+    code = status_code(exc)
+    if code is not None:
+        return code == 429 or 500 <= code < 600
+    return bool(_RETRYABLE_MESSAGE.search(str(exc)))
+
+
+class RateLimiter:
+    """
+    Process-wide limiter for every Gemini LLM and embedding call.
+
+    - token buckets for requests/minute and tokens/minute
+    - AIMD concurrency: +1 slot per window of successes, halved on 429/5xx
+    - jittered exponential backoff on retryable errors
+    - per-user fair queuing: waiting users are served round-robin
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 60,
+        tokens_per_minute: int = 1_000_000,
+        max_concurrency: int = 8,
+        min_concurrency: int = 1,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._clock = clock
+        self._sleep = sleep
+
+        self._cond = threading.Condition()
+        self._request_budget = float(requests_per_minute)
+        self._token_budget = float(tokens_per_minute)
+        self._last_refill = clock()
+
+        self._limit = float(max_concurrency)
+        self._in_flight = 0
+
+        # user -> waiting tickets; order of keys is the round-robin ring
+        self._waiting: "OrderedDict[str, deque]" = OrderedDict()
+
+        self.stats = {"calls": 0, "retries": 0, "throttled": 0, "failed": 0}
+
+    # ---------- main API ----------
+
+    def call(
+        self,
+        fn: Callable[[], T],
+        user: Optional[str] = None,
+        tokens: int = 1
+    ) -> T:
+        """
+        Runs fn() under the limiter, retrying quota and server errors.
+        """
+        user = user or _current_user.get()
+
+        for attempt in range(self.max_retries + 1):
+            self._acquire(user, tokens)
+            throttled = False
+            try:
+                return fn()
+            except Exception as e:
+                throttled = is_retryable(e)
+                if not throttled or attempt == self.max_retries:
+                    with self._cond:
+                        self.stats["failed"] += 1
+                    raise
+
+                with self._cond:
+                    self.stats["retries"] += 1
+            finally:
+                # even on KeyboardInterrupt/SystemExit: never leak the slot
+                self._release(throttled=throttled)
+
+            self._sleep(self._backoff(attempt))
+
+    @property
+    def concurrency_limit(self) -> int:
+        with self._cond:
+            return int(self._limit)
+
+    # ---------- internals ----------
+
+    def _backoff(self, attempt: int) -> float:
+        # "full jitter": spreads retries of many callers over the whole window
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    def _refill(self) -> None:
+        now = self._clock()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+
+        self._request_budget = min(
+            float(self.requests_per_minute),
+            self._request_budget + elapsed * self.requests_per_minute / 60
+        )
+        self._token_budget = min(
+            float(self.tokens_per_minute),
+            self._token_budget + elapsed * self.tokens_per_minute / 60
+        )
+
+    def _wait_time(self, tokens: int) -> Optional[float]:
+        """
+        Seconds until the buckets can cover one request of `tokens`,
+        or None if only a free concurrency slot can unblock us.
+        """
+        if self._in_flight >= int(self._limit):
+            return None
+
+        missing_requests = max(0.0, 1 - self._request_budget)
+        missing_tokens = max(0.0, tokens - self._token_budget)
+        return max(
+            missing_requests * 60 / self.requests_per_minute,
+            missing_tokens * 60 / self.tokens_per_minute
+        )
+
+    def _acquire(self, user: str, tokens: int) -> None:
+        # a single call may never need more than a full bucket
+        tokens = min(tokens, self.tokens_per_minute)
+        ticket = object()
+
+        with self._cond:
+            self._waiting.setdefault(user, deque()).append(ticket)
+
+            while True:
+                self._refill()
+                head_user = next(iter(self._waiting))
+                is_next = self._waiting[head_user][0] is ticket
+                wait = self._wait_time(tokens)
+
+                if is_next and wait == 0:
+                    break
+
+                self._cond.wait(timeout=wait if is_next else None)
+
+            self._request_budget -= 1
+            self._token_budget -= tokens
+            self._in_flight += 1
+            self.stats["calls"] += 1
+
+            # round-robin: this user goes to the back of the ring
+            queue = self._waiting.pop(user)
+            queue.popleft()
+            if queue:
+                self._waiting[user] = queue
+
+            self._cond.notify_all()
+
+    def _release(self, throttled: bool) -> None:
+        with self._cond:
+            self._in_flight -= 1
+
+            if throttled:
+                self.stats["throttled"] += 1
+                self._limit = max(float(self.min_concurrency), self._limit / 2)
+            else:
+                self._limit = min(
+                    float(self.max_concurrency),
+                    self._limit + 1 / max(1.0, self._limit)
+                )
+
+            self._cond.notify_all()
+
+
+_limiter: Optional[RateLimiter] = None
+_limiter_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimiter:
+    """
+    The shared process-wide limiter, configured from the environment.
+    """
+    global _limiter
+
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = RateLimiter(
+                requests_per_minute=int(os.getenv("GEMINI_RPM", "60")),
+                tokens_per_minute=int(os.getenv("GEMINI_TPM", "1000000")),
+                max_concurrency=int(os.getenv("GEMINI_MAX_CONCURRENCY", "8")),
+            )
+        return _limiter
@@ -0,0 +1,185 @@
+# modules/revisions.py
+
+from typing import Dict, Iterable, Optional, Set
+from contextlib import closing
+from dataclasses import dataclass, field
+import hashlib
+import sqlite3
+import threading
+import time
+
+
+def page_hash(text: str) -> str:
+    """
+    Content hash of one page, insensitive to whitespace-only changes.
+    """
+    normalized = " ".join(text.split())
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class PageDiff:
+    """
+    Page-level difference between a known document and its new revision.
+    """
+    added: Set[str] = field(default_factory=set)
+    removed: Set[str] = field(default_factory=set)
+    unchanged: Set[str] = field(default_factory=set)
+    is_revision: bool = False
+
+    @property
+    def stats(self) -> Dict:
+        return {
+            "added": len(self.added),
+            "removed": len(self.removed),
+            "unchanged": len(self.unchanged),
+            "is_revision": self.is_revision
+        }
+
+
+@dataclass
+class Release:
+    """
+    Documents no lineage points to any more, and the page hashes that no
+    remaining document uses: safe to delete from caches and the vector store.
+    """
+    documents: Set[str] = field(default_factory=set)
+    pages: Set[str] = field(default_factory=set)
+
+
+class RevisionTracker:
+    """
+    Remembers the page hashes of every ingested document, so a re-published
+    PDF only pays for the pages that actually changed.
+
+    - a lineage is one user's file (user, source name): re-uploading it with
+      new content is a revision; other users' same-named files are not
+    - documents are reference counted by lineages, pages by documents
+    """
+
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS lineages (
+        user       TEXT NOT NULL,
+        source     TEXT NOT NULL,
+        doc_hash   TEXT NOT NULL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (user, source)
+    );
+    CREATE INDEX IF NOT EXISTS lineages_doc ON lineages (doc_hash);
+
+    CREATE TABLE IF NOT EXISTS document_pages (
+        doc_hash  TEXT NOT NULL,
+        page_hash TEXT NOT NULL,
+        PRIMARY KEY (doc_hash, page_hash)
+    );
+    CREATE INDEX IF NOT EXISTS document_pages_page ON document_pages (page_hash);
+    """
+
+    def __init__(self, db_path: str = "cramit_jobs.db"):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.executescript(self.SCHEMA)
+
+    def _connect(self) -> sqlite3.Connection:
+        # explicit BEGIN IMMEDIATE: other processes share the database
+        return sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+
+    # ---------- main API ----------
+
+    def known_hashes(self, user: Optional[str], source: str) -> Optional[Set[str]]:
+        with self._lock, closing(self._connect()) as conn:
+            row = conn.execute(
+                "SELECT doc_hash FROM lineages WHERE user = ? AND source = ?",
+                (user or "", source)
+            ).fetchone()
+            if row is None:
+                return None
+            return {
+                page for (page,) in conn.execute(
+                    "SELECT page_hash FROM document_pages WHERE doc_hash = ?", row
+                )
+            }
+
+    def diff(self, user: Optional[str], source: str, page_hashes: Iterable[str]) -> PageDiff:
+        new_hashes = set(page_hashes)
+        old_hashes = self.known_hashes(user, source)
+
+        if old_hashes is None:
+            return PageDiff(added=new_hashes)
+
+        return PageDiff(
+            added=new_hashes - old_hashes,
+            removed=old_hashes - new_hashes,
+            unchanged=new_hashes & old_hashes,
+            is_revision=True
+        )
+
+    def record(
+        self,
+        user: Optional[str],
+        source: str,
+        doc_hash: str,
+        page_hashes: Iterable[str]
+    ) -> None:
+        """
+        Points the (user, source) lineage at doc_hash. The document it
+        pointed to before is only released by collect(), once unreferenced.
+        """
+        with self._lock, closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.executemany(
+                    "INSERT OR IGNORE INTO document_pages (doc_hash, page_hash) VALUES (?, ?)",
+                    [(doc_hash, page) for page in set(page_hashes)]
+                )
+                conn.execute(
+                    """
+                    INSERT INTO lineages (user, source, doc_hash, updated_at)
+                    VALUES (?, ?, ?, ?)
+                    ON CONFLICT (user, source) DO UPDATE SET
+                        doc_hash = excluded.doc_hash,
+                        updated_at = excluded.updated_at
+                    """,
+                    (user or "", source, doc_hash, time.time())
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+
+    def collect(self) -> Release:
+        """
+        Forgets every recorded document that no lineage points to and
+        returns them, plus the pages no remaining document contains.
+        """
+        with self._lock, closing(self._connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                documents = {
+                    doc for (doc,) in conn.execute(
+                        """
+                        SELECT DISTINCT doc_hash FROM document_pages
+                        WHERE doc_hash NOT IN (SELECT doc_hash FROM lineages)
+                        """
+                    )
+                }
+                pages = set()
+                for doc in documents:
+                    pages.update(page for (page,) in conn.execute(
+                        "SELECT page_hash FROM document_pages WHERE doc_hash = ?", (doc,)
+                    ))
+                    conn.execute("DELETE FROM document_pages WHERE doc_hash = ?", (doc,))
+
+                release = Release(documents=documents, pages={
+                    page for page in pages
+                    if conn.execute(
+                        "SELECT 1 FROM document_pages WHERE page_hash = ? LIMIT 1", (page,)
+                    ).fetchone() is None
+                })
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return release
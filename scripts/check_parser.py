@@ -0,0 +1,64 @@
+# scripts/check_parser.py
+"""
+Regression check for layout-aware boilerplate stripping (modules.pdf_parser).
+
+    python scripts/check_parser.py --pages 30
+
+Parses the load-test lecture notes (scripts/fixtures.py) and checks that the
+running header and page numbers are gone while every body paragraph
+survives intact. Exits 1 on failure.
+"""
+
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fixtures import body_lines, make_pdf  # noqa: E402
+from modules.pdf_parser import PDFParser  # noqa: E402
+
+
+def check(pages: int) -> list:
+    title = "Course 0"
+    parsed, report = PDFParser(layout_aware=True).parse_with_report(
+        make_pdf(title, pages), "course-0.pdf"
+    )
+    problems = []
+
+    if len(parsed) != pages:
+        problems.append(f"expected {pages} pages, got {len(parsed)}")
+
+    for page in parsed:
+        number = page["metadata"]["page"]
+        text = " ".join(page["text"].split())
+        lines = page["text"].splitlines()
+
+        missing = [p for p in body_lines(title, number) if p not in text]
+        if missing:
+            problems.append(f"page {number}: {len(missing)} body paragraphs lost, e.g. {missing[0]!r}")
+        if "Lecture Notes" in text:
+            problems.append(f"page {number}: running header kept")
+        if str(number) in (line.strip() for line in lines):
+            problems.append(f"page {number}: page number kept")
+
+    print(f"pages: {report['pages']}, lines removed: {report['lines_removed']}, "
+          f"reduction: {report['reduction']:.1%}")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--pages", type=int, default=30)
+    args = parser.parse_args()
+
+    problems = check(args.pages)
+    for problem in problems:
+        print(f"FAIL {problem}")
+    if problems:
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+# scripts/fake_gemini.py
+"""
+Local stand-in for the Gemini API that injects quota and server errors,
+plus a driver that exercises modules.rate_limiter against it.
+
+    python scripts/fake_gemini.py serve --port 8765 --error-429 0.1
+    python scripts/fake_gemini.py drive --users 3 --calls 40 --quota-concurrency 4
+
+`drive` starts its own fake server unless --url is given, then runs one
+heavy user alongside light users and reports retries, failures, the
+concurrency limit AIMD settled on, and how long each user waited.
+"""
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.rate_limiter import RateLimiter  # noqa: E402
+
+
+class FakeGemini(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, error_429=0.0, error_5xx=0.0,
+                 latency=0.05, quota_concurrency=0):
+        super().__init__(address, _Handler)
+        self.error_429 = error_429
+        self.error_5xx = error_5xx
+        self.latency = latency
+        self.quota_concurrency = quota_concurrency
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.counts = {"ok": 0, "429": 0, "5xx": 0}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: FakeGemini
+
+    def log_message(self, *args):
+        pass  # keep the driver output readable
+
+    def _reply(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        length = int(self.headers.get("Content-Length", 0))
+        prompt = json.loads(self.rfile.read(length) or b"{}").get("prompt", "")
+
+        with server.lock:
+            over_quota = (
+                server.quota_concurrency
+                and server.in_flight >= server.quota_concurrency
+            )
+            server.in_flight += 1
+
+        try:
+            roll = random.random()
+            if over_quota or roll < server.error_429:
+                server.counts["429"] += 1
+                return self._reply(429, {"error": "Resource has been exhausted"})
+            if roll < server.error_429 + server.error_5xx:
+                server.counts["5xx"] += 1
+                return self._reply(503, {"error": "The model is overloaded"})
+
+            time.sleep(server.latency)
+            server.counts["ok"] += 1
+            return self._reply(200, {"text": f"echo: {prompt[:40]}"})
+        finally:
+            with server.lock:
+                server.in_flight -= 1
+
+
+def call_fake(url: str, prompt: str) -> str:
+    request = urllib.request.Request(
+        url,
+        data=json.dumps({"prompt": prompt}).encode(),
+        headers={"Content-Type": "application/json"},
+        method="POST"
+    )
+    # urllib.error.HTTPError carries .code, which the limiter classifies
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())["text"]
+
+
+def drive(args) -> None:
+    server = None
+    url = args.url
+    if url is None:
+        server = FakeGemini(
+            ("127.0.0.1", 0),
+            error_429=args.error_429,
+            error_5xx=args.error_5xx,
+            latency=args.latency,
+            quota_concurrency=args.quota_concurrency
+        )
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}/generate"
+
+    limiter = RateLimiter(
+        requests_per_minute=args.rpm,
+        max_concurrency=args.max_concurrency,
+        base_delay=0.05,
+        max_delay=1.0
+    )
+
+    # user 0 is the "whole textbook" user, the rest ask a handful of questions
+    workload = [("heavy", args.calls)] + [
+        (f"light-{i}", max(1, args.calls // 10)) for i in range(1, args.users)
+    ]
+    finished = {}
+    errors = []
+
+    def one_call(user: str, i: int) -> None:
+        try:
+            limiter.call(lambda: call_fake(url, f"{user} #{i}"), user=user, tokens=50)
+        except urllib.error.HTTPError as e:
+            errors.append((user, e.code))
+        finished[user] = time.monotonic() - start
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=64) as pool:
+        for user, calls in workload:
+            for i in range(calls):
+                pool.submit(one_call, user, i)
+
+    print(f"limiter stats:     {limiter.stats}")
+    print(f"concurrency limit: {limiter.concurrency_limit} (max {args.max_concurrency})")
+    print(f"unrecovered errors: {len(errors)}")
+    for user, calls in workload:
+        print(f"  {user:<8} {calls:>4} calls, done after {finished.get(user, 0):.2f}s")
+    if server is not None:
+        print(f"server saw:        {server.counts}")
+        server.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    for name in ("serve", "drive"):
+        p = sub.add_parser(name)
+        p.add_argument("--error-429", type=float, default=0.05)
+        p.add_argument("--error-5xx", type=float, default=0.02)
+        p.add_argument("--latency", type=float, default=0.05)
+        p.add_argument("--quota-concurrency", type=int, default=4,
+                       help="answer 429 when more requests than this are in flight (0 = off)")
+
+    serve = sub.choices["serve"]
+    serve.add_argument("--port", type=int, default=8765)
+
+    run = sub.choices["drive"]
+    run.add_argument("--url", default=None)
+    run.add_argument("--users", type=int, default=3)
+    run.add_argument("--calls", type=int, default=60)
+    run.add_argument("--rpm", type=int, default=6000)
+    run.add_argument("--max-concurrency", type=int, default=16)
+
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        server = FakeGemini(
+            ("127.0.0.1", args.port),
+            error_429=args.error_429,
+            error_5xx=args.error_5xx,
+            latency=args.latency,
+            quota_concurrency=args.quota_concurrency
+        )
+        print(f"Fake Gemini listening on http://127.0.0.1:{args.port}/generate")
+        server.serve_forever()
+    else:
+        drive(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,31 @@
+# scripts/fixtures.py
+"""
+Synthetic lecture-notes PDFs shared by the scripts in this folder.
+"""
+
+import fitz
+
+
+def body_lines(title: str, number: int, paragraphs: int = 12):
+    return [
+        f"{title} page {number}, paragraph {p}: the quick brown fox studies "
+        f"topic {number * 7 + p} before the exam and takes careful notes."
+        for p in range(paragraphs)
+    ]
+
+
+def make_pdf(title: str, pages: int) -> bytes:
+    """
+    `pages` pages of body text under a running header, with a page number
+    in the footer.
+    """
+    doc = fitz.open()
+    for number in range(1, pages + 1):
+        page = doc.new_page()
+        page.insert_text((72, 40), f"{title} - Lecture Notes", fontsize=9)
+        body = "\n".join(body_lines(title, number))
+        page.insert_textbox(fitz.Rect(72, 72, 540, 760), body, fontsize=10)
+        page.insert_text((300, 810), str(number), fontsize=9)
+    data = doc.tobytes()
+    doc.close()
+    return data
@@ -0,0 +1,176 @@
+# scripts/load_test_ingest.py
+"""
+Load test for modules.ingest_service with a local stand-in for the models.
+
+    python scripts/load_test_ingest.py --users 8 --docs 4 --pages 30
+
+Starts a fake Gemini endpoint (scripts/fake_gemini.py) and an in-process
+ingestion service, then has every user upload the same course PDFs plus one
+of their own. Like the app, the test indexes each finished document once,
+near-duplicates clustered, with "embeddings" going through the shared rate
+limiter to the fake endpoint. Reports upload latency, end-to-end throughput
+and how many uploads were served by cross-user dedup. Pass --url to load an
+already running service instead (nothing is indexed then).
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_gemini import FakeGemini, call_fake  # noqa: E402
+from fixtures import make_pdf  # noqa: E402
+from modules.chunk_store import ChunkStore  # noqa: E402
+from modules.dedup import ChunkDeduplicator  # noqa: E402
+from modules.ingest_service import IngestClient, IngestServer, IngestService  # noqa: E402
+from modules.rate_limiter import RateLimiter, estimate_tokens  # noqa: E402
+
+
+class FakeIndexer:
+    """
+    Stands in for QAEngine.add_chunks: one fake embedding request per batch.
+    """
+
+    def __init__(self, url: str, limiter: RateLimiter, batch_size: int = 32):
+        self.url = url
+        self.limiter = limiter
+        self.batch_size = batch_size
+        self.embedded = 0
+        self._lock = threading.Lock()
+
+    def add_chunks(self, chunks, doc_id):
+        for i in range(0, len(chunks), self.batch_size):
+            texts = [chunk["text"] for chunk in chunks[i:i + self.batch_size]]
+            self.limiter.call(
+                lambda: call_fake(self.url, texts[0]),
+                tokens=estimate_tokens("".join(texts))
+            )
+            with self._lock:
+                self.embedded += len(texts)
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+def index_document(client: IngestClient, indexer: FakeIndexer, doc_id: str) -> None:
+    # what the app's load_chunks + index job do with a finished document
+    chunks = ChunkStore.from_chunks(client.chunks(doc_id))
+    dedup = ChunkDeduplicator().cluster(chunks)
+    indexer.add_chunks(chunks.take(dedup.representatives).to_dicts(), doc_id)
+
+
+def run(args) -> None:
+    fake = service = server = indexer = None
+    url = args.url
+
+    if url is None:
+        fake = FakeGemini(
+            ("127.0.0.1", 0),
+            error_429=args.error_429,
+            error_5xx=0.0,
+            latency=args.latency,
+            quota_concurrency=args.quota_concurrency
+        )
+        threading.Thread(target=fake.serve_forever, daemon=True).start()
+
+        limiter = RateLimiter(requests_per_minute=args.rpm, base_delay=0.05, max_delay=1.0)
+        indexer = FakeIndexer(f"http://127.0.0.1:{fake.server_address[1]}/embed", limiter)
+
+        workdir = tempfile.mkdtemp(prefix="cramit_ingest_")
+        service = IngestService(
+            upload_dir=os.path.join(workdir, "uploads"),
+            db_path=os.path.join(workdir, "ingest.db"),
+            workers=args.workers
+        )
+        server = IngestServer(("127.0.0.1", 0), service)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = f"http://127.0.0.1:{server.server_address[1]}"
+
+    print(f"Generating {args.docs} shared + {args.users} personal PDFs ({args.pages} pages each)...")
+    shared = [(f"course-{d}.pdf", make_pdf(f"Course {d}", args.pages)) for d in range(args.docs)]
+    uploads = [
+        (f"user{u}@cramit.test", shared + [(f"mine-{u}.pdf", make_pdf(f"User {u}", args.pages))])
+        for u in range(args.users)
+    ]
+
+    client = IngestClient(url)
+    latencies, documents = [], set()
+    duplicates = 0
+    lock = threading.Lock()
+
+    def upload_all(user, files):
+        nonlocal duplicates
+        for name, data in files:
+            started = time.monotonic()
+            job = client.submit(data, name, user=user)
+            with lock:
+                latencies.append(time.monotonic() - started)
+                duplicates += job.doc_hash in documents
+                documents.add(job.doc_hash)
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=args.users) as pool:
+        for user, files in uploads:
+            pool.submit(upload_all, user, files)
+    accepted = time.monotonic() - start
+
+    pending = set(documents)
+    jobs = {}
+    with ThreadPoolExecutor(max_workers=args.workers) as indexing:
+        while pending:
+            for doc_id in list(pending):
+                job = client.status(doc_id)
+                if job.finished:
+                    jobs[doc_id] = job
+                    pending.discard(doc_id)
+                    if indexer is not None and job.state == "done":
+                        indexing.submit(index_document, client, indexer, doc_id)
+            time.sleep(0.2)
+    elapsed = time.monotonic() - start
+
+    pages = sum(job.meta.get("pages", 0) for job in jobs.values())
+    failed = [job for job in jobs.values() if job.state != "done"]
+
+    print(f"uploads:           {len(latencies)} from {args.users} users in {accepted:.2f}s")
+    print(f"upload latency:    p50 {statistics.median(latencies) * 1000:.0f} ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.0f} ms")
+    print(f"unique documents:  {len(jobs)} ({duplicates} uploads served by dedup)")
+    print(f"ingested in:       {elapsed:.2f}s ({len(jobs) / elapsed:.2f} docs/s, {pages / elapsed:.1f} pages/s)")
+    print(f"failed jobs:       {len(failed)}")
+    for job in failed:
+        print(f"  {job.doc_hash[:12]} {job.error}")
+
+    if fake is not None:
+        print(f"chunks embedded:   {indexer.embedded}")
+        print(f"limiter stats:     {limiter.stats}")
+        print(f"fake model saw:    {fake.counts}")
+        server.shutdown()
+        service.shutdown()
+        fake.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", default=None, help="existing ingestion service")
+    parser.add_argument("--users", type=int, default=8)
+    parser.add_argument("--docs", type=int, default=4, help="PDFs every user uploads")
+    parser.add_argument("--pages", type=int, default=30)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=0.05,
+                        help="fake model latency per request (s)")
+    parser.add_argument("--error-429", type=float, default=0.05)
+    parser.add_argument("--quota-concurrency", type=int, default=4)
+    parser.add_argument("--rpm", type=int, default=6000)
+    run(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,25 @@
+from modules.flashcard_store import FlashcardStore
+
+
+CARDS = [
+    {"question": "What is ATP?", "answer": "Energy currency"},
+    {"question": "what is  ATP?", "answer": "energy currency"},  # same card
+    {"question": "What is DNA?", "answer": "Genetic material"},
+]
+
+
+def test_duplicates_are_skipped_per_user(tmp_path):
+    store = FlashcardStore(str(tmp_path / "cards.db"))
+
+    assert store.add_many("alice@uni.edu", CARDS) == 2
+    assert store.add_many("alice@uni.edu", CARDS) == 0
+    assert store.add_many("bob@uni.edu", CARDS) == 2
+    assert store.count("alice@uni.edu") == 2
+
+
+def test_missing_user_still_saves(tmp_path):
+    store = FlashcardStore(str(tmp_path / "cards.db"))
+
+    assert store.add_many(None, CARDS) == 2
+    assert store.count(None) == 2
+    assert len(store.due(None)) == 2
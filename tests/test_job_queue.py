@@ -0,0 +1,156 @@
+import threading
+import time
+
+from modules.job_queue import DONE, FAILED, JobQueue, Tool
+
+
+def wait_for(queue, job_id, states=(DONE, FAILED), timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job.state in states:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f"job still {queue.get(job_id).state}")
+
+
+class Recorder:
+    """
+    Tool process that records every item it sees and can fail or block on one.
+    """
+
+    def __init__(self, fail_on=None, block_on=None):
+        self.seen = []
+        self.fail_on = fail_on
+        self.block_on = block_on
+        self.blocked = threading.Event()
+        self.release = threading.Event()
+        self._lock = threading.Lock()
+
+    def __call__(self, item):
+        with self._lock:
+            self.seen.append(item)
+        if item == self.fail_on:
+            self.fail_on = None  # fail once
+            raise RuntimeError(f"boom on {item}")
+        if item == self.block_on:
+            self.blocked.set()
+            self.release.wait(10)
+        return [item * 10]
+
+
+def make_queue(db_path, process, **kwargs):
+    return JobQueue({"t": Tool("t", process=process)}, db_path=str(db_path), **kwargs)
+
+
+def test_same_document_and_tool_is_one_job(tmp_path):
+    process = Recorder()
+    queue = make_queue(tmp_path / "jobs.db", process)
+
+    first = queue.submit("t", "doc", payload=[1, 2])
+    second = queue.submit("t", "doc", payload=[1, 2])
+    other = queue.submit("t", "other-doc", payload=[1, 2])
+
+    assert first == second != other
+    wait_for(queue, first)
+    wait_for(queue, other)
+    assert sorted(process.seen) == [1, 1, 2, 2]
+    queue.shutdown()
+
+
+def test_failed_job_retries_from_last_finished_item(tmp_path):
+    process = Recorder(fail_on=3)
+    queue = make_queue(tmp_path / "jobs.db", process)
+
+    job_id = queue.submit("t", "doc", payload=[1, 2, 3, 4])
+    job = wait_for(queue, job_id)
+    assert job.state == FAILED
+    assert job.done == 2
+    assert queue.results(job_id) == [10, 20]
+
+    assert queue.submit("t", "doc", payload=[1, 2, 3, 4]) == job_id
+    job = wait_for(queue, job_id, states=(DONE,))
+
+    assert (job.done, job.total) == (4, 4)
+    assert queue.results(job_id) == [10, 20, 30, 40]
+    assert process.seen == [1, 2, 3, 3, 4]  # finished items never re-run
+    queue.shutdown()
+
+
+def test_crashed_owner_is_taken_over_from_last_finished_item(tmp_path):
+    db_path = tmp_path / "jobs.db"
+    stuck = Recorder(block_on=2)
+    crashed = make_queue(db_path, stuck, lease_seconds=0.3)
+
+    job_id = crashed.submit("t", "doc", payload=[1, 2, 3])
+    assert stuck.blocked.wait(5)
+    crashed.shutdown(wait=False)  # its heartbeat stops: the lease runs out
+    time.sleep(0.4)
+
+    process = Recorder()
+    queue = make_queue(db_path, process, lease_seconds=0.3)
+    job = wait_for(queue, job_id)
+
+    assert job.state == DONE
+    assert (job.done, job.total) == (3, 3)
+    assert process.seen == [2, 3]
+
+    # the old owner wakes up: its late write must not count twice
+    stuck.release.set()
+    time.sleep(0.3)
+    job = queue.get(job_id)
+    assert (job.done, job.total) == (3, 3)
+    assert queue.results(job_id) == [10, 20, 30]
+    queue.shutdown()
+
+
+def test_live_owner_keeps_its_running_job(tmp_path):
+    db_path = tmp_path / "jobs.db"
+    slow = Recorder(block_on=1)
+    owner = make_queue(db_path, slow, lease_seconds=0.3)
+
+    job_id = owner.submit("t", "doc", payload=[1, 2, 3])
+    assert slow.blocked.wait(5)
+
+    # e.g. a second server process, or st.cache_resource being cleared
+    other = Recorder()
+    second = make_queue(db_path, other, lease_seconds=0.3)
+    time.sleep(0.6)  # several heartbeats: the lease stays renewed
+    slow.release.set()
+
+    job = wait_for(owner, job_id)
+    assert job.state == DONE
+    assert (job.done, job.total) == (3, 3)
+    assert other.seen == []
+    assert owner.results(job_id) == [10, 20, 30]
+    owner.shutdown()
+    second.shutdown()
+
+
+def test_cached_items_are_reused_and_restamped(tmp_path):
+    seen = []
+
+    def process(page):
+        seen.append(page["text"])
+        return [{"text": page["text"].upper(), "page": page["page"]}]
+
+    def restamp(page, chunks):
+        return [dict(chunk, page=page["page"]) for chunk in chunks]
+
+    tool = Tool("t", process=process, cache_key=lambda page: page["text"], reuse=restamp)
+    queue = JobQueue({"t": tool}, db_path=str(tmp_path / "jobs.db"))
+
+    first = queue.submit("t", "v1", payload=[{"text": "a", "page": 1}, {"text": "b", "page": 2}])
+    wait_for(queue, first)
+
+    # revised document: a page inserted in front, the others moved down
+    second = queue.submit("t", "v2", payload=[
+        {"text": "new", "page": 1}, {"text": "a", "page": 2}, {"text": "b", "page": 3}
+    ])
+    wait_for(queue, second)
+
+    assert seen == ["a", "b", "new"]
+    assert queue.results(second) == [
+        {"text": "NEW", "page": 1}, {"text": "A", "page": 2}, {"text": "B", "page": 3}
+    ]
+    queue.shutdown()
@@ -0,0 +1,119 @@
+import threading
+import time
+
+import pytest
+
+from modules.rate_limiter import RateLimiter, user_context
+
+
+class QuotaError(Exception):
+    status_code = 429
+
+
+def make_limiter(**kwargs):
+    kwargs.setdefault("requests_per_minute", 60_000)
+    return RateLimiter(sleep=lambda seconds: None, **kwargs)
+
+
+def flaky(failures, error=QuotaError, message="429 resource exhausted"):
+    calls = []
+
+    def fn():
+        calls.append(1)
+        if len(calls) <= failures:
+            raise error(message)
+        return "ok"
+
+    return fn, calls
+
+
+def test_429_halves_concurrency_and_is_retried():
+    limiter = make_limiter(max_concurrency=8)
+    fn, calls = flaky(failures=1)
+
+    assert limiter.call(fn) == "ok"
+    assert len(calls) == 2
+    assert limiter.concurrency_limit == 4  # halved, then +1/4 for the success
+    assert limiter.stats["retries"] == 1
+    assert limiter.stats["throttled"] == 1
+
+
+def test_concurrency_never_drops_below_the_minimum():
+    limiter = make_limiter(max_concurrency=8, min_concurrency=2, max_retries=10)
+    fn, _ = flaky(failures=6)
+
+    limiter.call(fn)
+    assert limiter.concurrency_limit == 2
+
+
+def test_other_errors_are_not_retried_and_do_not_throttle():
+    limiter = make_limiter(max_concurrency=8)
+    fn, calls = flaky(failures=1, error=ValueError, message="bad prompt")
+
+    with pytest.raises(ValueError):
+        limiter.call(fn)
+    assert len(calls) == 1
+    assert limiter.concurrency_limit == 8
+    assert limiter.stats["failed"] == 1
+
+
+def test_gives_up_after_max_retries():
+    limiter = make_limiter(max_retries=2)
+    fn, calls = flaky(failures=10)
+
+    with pytest.raises(QuotaError):
+        limiter.call(fn)
+    assert len(calls) == 3
+
+
+def test_base_exception_releases_the_slot():
+    limiter = make_limiter(max_concurrency=1)
+
+    def interrupted():
+        raise KeyboardInterrupt
+
+    with pytest.raises(KeyboardInterrupt):
+        limiter.call(interrupted)
+    assert limiter._in_flight == 0
+    assert limiter.call(lambda: "ok") == "ok"
+
+
+def test_waiting_users_are_served_round_robin():
+    limiter = make_limiter(max_concurrency=1)
+    order = []
+    gate = threading.Event()
+    threads = []
+
+    def waiting():
+        with limiter._cond:
+            return sum(len(tickets) for tickets in limiter._waiting.values())
+
+    def start(user, label, fn=None):
+        def run():
+            with user_context(user):
+                limiter.call(fn or (lambda: order.append(label)))
+
+        before = waiting()
+        thread = threading.Thread(target=run)
+        thread.start()
+        threads.append(thread)
+        deadline = time.monotonic() + 5
+        while waiting() == before and time.monotonic() < deadline:
+            time.sleep(0.005)
+
+    # hold the only slot, then queue a heavy user's burst before a light user
+    holder = threading.Thread(target=lambda: limiter.call(gate.wait, user="holder"))
+    holder.start()
+    while limiter._in_flight == 0:
+        time.sleep(0.005)
+
+    for i in range(3):
+        start("heavy", f"heavy-{i}")
+    start("light", "light-0")
+
+    gate.set()
+    holder.join(5)
+    for thread in threads:
+        thread.join(5)
+
+    assert order == ["heavy-0", "light-0", "heavy-1", "heavy-2"]